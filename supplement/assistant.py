@@ -1,3 +1,4 @@
+import ast
 import logging
 from keyword import iskeyword
 from inspect import formatargspec
@@ -6,37 +7,72 @@ from tokenize import (NAME, NL, NEWLINE, TokenError, generate_tokens,
 
 from .fixer import fix, sanitize_encoding
 from .scope import get_scope_at
-from .evaluator import infer
+from .evaluator import infer, Budget, BudgetExceeded
 
 def get_scope_names(scope, lineno=None):
     inject_bases = scope.type == 'class'
     project = scope.project
     while scope:
-        yield scope.get_names(lineno)
+        index = scope.get_name_index()
+        yield index.at(lineno) if lineno is not None else index
         lineno = None
 
         if inject_bases:
             inject_bases = False
-            yield scope.cls.get_names()
+            try:
+                names = scope.cls.get_names()
+            except BudgetExceeded:
+                names = ()
+
+            yield names
 
         scope = scope.parent
 
     m = project.get_module('__builtin__')
-    yield m.get_names()
+    yield m.get_name_index()
 
 def collect_names(match, names):
+    """Returns names starting with match grouped by source
+
+    Sources with ``select`` method (name indexes) are queried by prefix,
+    other ones are scanned.
+    """
     existing = set()
     result = []
     for name_list in names:
-        names_to_add = []
-        for r in name_list:
+        select = getattr(name_list, 'select', None)
+        if select:
+            candidates = select(match)
+        else:
+            candidates = []
+            for r in name_list:
+                if r.startswith(match):
+                    candidates.append(r)
+            candidates.sort()
+
+        for r in candidates:
             if r in existing: continue
             if not match and r.startswith('__'): continue
-            if not match or (r.startswith(match) and match != r):
-                names_to_add.append(r)
+            if match != r:
+                result.append(r)
                 existing.add(r)
 
-        result.extend(sorted(names_to_add))
+    return result
+
+def narrow_names(project, key, match):
+    """Returns previous proposals filtered by match if only match was extended"""
+    try:
+        last_key, last_match, last_result = project.last_assist
+    except AttributeError:
+        return None
+
+    if last_key != key or not last_match or not match.startswith(last_match):
+        return None
+
+    result = []
+    for r in last_result:
+        if r.startswith(match) and r != match:
+            result.append(r)
 
     return result
 
@@ -274,30 +310,105 @@ def get_context(source, position):
 
     return ctype, lineno, ctx, match, fctx
 
-def get_fixed_source(project, source):
-    source = sanitize_encoding(source)
-    ast_nodes, fixed_source = fix(source)
+def get_ast(source, document=None):
+    if document:
+        return document.get_ast()
+
+    return fix(sanitize_encoding(source))
+
+def create_budget(project):
+    config = project.config
+    return Budget(config.get('inference_steps', 10000), config.get('inference_timeout', 3))
+
+def create_collect_budget(project):
+    config = project.config
+    return Budget(config.get('collect_steps', 10000), config.get('inference_timeout', 3), False)
+
+def get_definitions_hash(scope, source, lineno):
+    """Returns hash of definitions visible from the scope at the line
+
+    Definitions are represented by text of their lines, so inserted lines
+    and statements other than definitions keep the hash. Assignments inside
+    the outermost enclosing class or function are included as they define
+    attributes.
+    """
+    lines = source.splitlines()
+    result = []
+    outer = None
+    while scope:
+        if scope.get_lineno():
+            result.append(lines[scope.get_lineno()-1])
+            outer = scope
+
+        if scope.type != 'inner':
+            for name, locations in sorted(scope.get_names().iteritems()):
+                for line, _ in locations:
+                    if (lineno is None or line <= lineno) and 0 < line <= len(lines):
+                        result.append(lines[line-1])
+
+        lineno = None
+        scope = scope.parent
+
+    if outer:
+        for node in ast.walk(outer.node):
+            if isinstance(node, (ast.Assign, ast.AugAssign)) and node.lineno <= len(lines):
+                result.append(lines[node.lineno-1])
+
+    return hash('\n'.join(result))
+
+def get_cached(project, source, position, lineno, scope, expr, kind, func, default=None):
+    # Identifier under cursor is a part of the key, visible definitions must
+    # match including the ones on cursor line
+    start = position
+    while start > 0 and (source[start-1].isalnum() or source[start-1] == '_'):
+        start -= 1
+
+    end = position
+    while end < len(source) and (source[end].isalnum() or source[end] == '_'):
+        end += 1
+
+    check = get_definitions_hash(scope, source[:start] + source[end:], lineno)
+
+    try:
+        return project.inference_cache.get(
+            (scope.filename, scope.fullname, expr, kind), check, func)
+    except BudgetExceeded:
+        return default
+
+def get_fixed_source(project, source, document=None):
+    ast_nodes, fixed_source = get_ast(source, document)
     return fixed_source
 
-def assist(project, source, position, filename):
+def assist(project, source, position, filename, document=None):
     logging.getLogger(__name__).info('assist %s %s', project.root, filename)
     ctx_type, lineno, ctx, match, fctx = get_context(source, position)
+
+    start = position - len(match)
+    key = filename, ctx_type, ctx, fctx, source[:start], source[position:]
+    result = narrow_names(project, key, match)
+    if result is not None:
+        project.last_assist = key, match, result
+        return match, result
+
+    budget = create_budget(project)
     if ctx_type == 'expr':
-        source = sanitize_encoding(source)
-        ast_nodes, fixed_source = fix(source)
+        ast_nodes, fixed_source = get_ast(source, document)
 
         scope = get_scope_at(project, fixed_source, lineno, filename, ast_nodes)
-        project.calldb.collect_calls(scope.get_toplevel(), True)
-        if not ctx:
-            names = get_scope_names(scope, lineno)
-            if fctx:
-                funcobj = infer(fctx, scope, lineno)
-                args = funcobj.get_signature()
-                if args:
-                    names = [(r + '=' for r in args[1])] + list(names)
-        else:
-            obj = infer(ctx, scope, lineno)
-            names = [obj.get_names()]
+        with create_collect_budget(project):
+            project.calldb.collect_calls(scope.get_toplevel(), True, True)
+
+        with budget:
+            if not ctx:
+                names = list(get_scope_names(scope, lineno))
+                if fctx:
+                    args = get_cached(project, source, position, lineno, scope, fctx, 'signature',
+                        lambda: infer(fctx, scope, lineno).get_signature())
+                    if args:
+                        names = [(r + '=' for r in args[1])] + names
+            else:
+                names = [get_cached(project, source, position, lineno, scope, ctx, 'names',
+                    lambda: infer(ctx, scope, lineno).get_names(), ())]
     elif ctx_type == 'import':
         names = (project.get_possible_imports(ctx, filename),)
     elif ctx_type == 'from-import':
@@ -307,7 +418,11 @@ def assist(project, source, position, filename):
     elif ctx_type is None:
         return match, []
 
-    return match, collect_names(match, names)
+    result = collect_names(match, names)
+    if not budget.exceeded:
+        project.last_assist = key, match, result
+
+    return match, result
 
 def char_is_id(c):
     return c == '_' or c.isalnum()
@@ -319,20 +434,22 @@ def get_id_ending(source, position):
 
     return position
 
-def get_location(project, source, position, filename):
+def get_location(project, source, position, filename, document=None):
     position = get_id_ending(source, position)
     ctx_type, lineno, ctx, match, fctx = get_context(source, position)
 
     if ctx_type == 'expr':
-        source = sanitize_encoding(source)
-        ast_nodes, fixed_source = fix(source)
+        ast_nodes, fixed_source = get_ast(source, document)
         scope = get_scope_at(project, fixed_source, lineno, filename, ast_nodes)
-        if not ctx:
-            obj = scope.find_name(match, lineno)
-        else:
-            obj = infer(ctx, scope, lineno)[match]
+        with create_budget(project):
+            if not ctx:
+                try:
+                    return scope.find_name(match, lineno).get_location()
+                except BudgetExceeded:
+                    return None, None
 
-        return obj.get_location()
+            return get_cached(project, source, position, lineno, scope, ctx + '.' + match, 'location',
+                lambda: infer(ctx, scope, lineno)[match].get_location(), (None, None))
 
     elif ctx_type in ('import', 'from-import'):
         if ctx:
@@ -355,19 +472,21 @@ def get_location(project, source, position, filename):
 
     return None, None
 
-def get_docstring(project, source, position, filename):
+def get_docstring(project, source, position, filename, document=None):
     position = get_id_ending(source, position)
     ctx_type, lineno, ctx, match, fctx = get_context(source, position)
     if ctx_type == 'expr' and fctx:
-        source = sanitize_encoding(source)
-        ast_nodes, fixed_source = fix(source)
+        ast_nodes, fixed_source = get_ast(source, document)
         scope = get_scope_at(project, fixed_source, lineno, filename, ast_nodes)
-        obj = infer(fctx, scope, lineno)
+        with create_budget(project):
+            return get_cached(project, source, position, lineno, scope, fctx, 'docstring',
+                lambda: get_signature_and_docstring(infer(fctx, scope, lineno)))
 
-        sig = obj.get_signature()
-        if sig:
-            sig = '%s%s' % (sig[0], formatargspec(*sig[1:]))
+    return None
 
-        return sig, obj.get_docstring()
+def get_signature_and_docstring(obj):
+    sig = obj.get_signature()
+    if sig:
+        sig = '%s%s' % (sig[0], formatargspec(*sig[1:]))
 
-    return None
+    return sig, obj.get_docstring()
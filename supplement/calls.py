@@ -1,8 +1,20 @@
 import ast
-from .utils import WeakedList
+import os
+import logging
+import sqlite3
+from hashlib import md5
+from os.path import join, exists, getmtime
+from itertools import imap, islice
+from threading import Lock
+from multiprocessing import Pool
+from collections import OrderedDict
+from weakref import ref
+
+from .fixer import fix, sanitize_encoding
 from .common import UnknownObject
 from .names import ClassName, ImportedName
 from .objects import ClassObject
+from .evaluator import Budget, BudgetExceeded, spend_budget
 
 class CallExtractor(ast.NodeVisitor):
     def process(self, node):
@@ -27,32 +39,246 @@ class CallExtractor(ast.NodeVisitor):
         self.generic_visit(node)
 
 
-class CallInfo(object):
-    def __init__(self, scope, line, args):
-        self.scope = scope
-        self.line = line
-        self.args = args
+def get_file_stamp(filename, content):
+    return getmtime(filename), md5(content).hexdigest()
 
-    def get_args(self):
+def get_call_positions(scope):
+    """Returns ``(scope name, index)`` of every call with arguments"""
+    from .scope import traverse_tree
+
+    call_extractor = CallExtractor()
+    positions = []
+    for s in traverse_tree(scope):
+        for idx, (line, func, args) in enumerate(call_extractor.process(s.node)):
+            if args:
+                positions.append((s.fullname, idx))
+
+    return positions
+
+def iter_position_calls(scope, positions):
+    """Yields position, scope, line, func and args of calls at given positions
+
+    :param positions: sequence of tuples starting with scope name and index
+    """
+    from .scope import traverse_tree
+
+    scopes = {}
+    for s in traverse_tree(scope):
+        scopes[s.fullname] = s
+
+    call_extractor = CallExtractor()
+    scope_calls = {}
+    for pos in positions:
+        sname = pos[0]
+        idx = pos[1]
         try:
-            return self._evaluated_args
-        except AttributeError:
-            pass
+            s = scopes[sname]
+        except KeyError:
+            continue
 
-        result = []
-        for arg in self.args:
-            try:
-                v = self.scope.eval(arg, False)
-            except:
+        try:
+            extracted = scope_calls[sname]
+        except KeyError:
+            extracted = call_extractor.process(s.node)
+            scope_calls[sname] = extracted
+
+        if idx < len(extracted):
+            line, func, args = extracted[idx]
+            yield pos, s, line, func, args
+
+def prepare_source(filename):
+    """Returns fixed source of a file and positions of its calls with arguments
+
+    Executed by index worker processes.
+    """
+    from .scope import create_module_scope
+
+    try:
+        content = open(filename).read()
+        stamp = get_file_stamp(filename, content)
+        tree, source = fix(sanitize_encoding(content))
+    except Exception:
+        return filename, None, None, None
+
+    positions = get_call_positions(create_module_scope(None, source, filename, tree))
+    if not positions:
+        return filename, None, stamp, positions
+
+    return filename, source, stamp, positions
+
+
+class CallStore(object):
+    """Persistent storage of collected call sites
+
+    For every file read from disk it keeps file mtime and content hash and
+    position of each resolved call: caller scope name and index of the call
+    in that scope. Calls are restored from source without evaluation.
+    """
+    def __init__(self, filename):
+        self.lock = Lock()
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (filename TEXT PRIMARY KEY, mtime REAL, hash TEXT);
+            CREATE TABLE IF NOT EXISTS calls (filename TEXT, scope TEXT, idx INTEGER,
+                callee_file TEXT, callee TEXT);
+            CREATE INDEX IF NOT EXISTS calls_callee ON calls (callee_file, callee);
+            CREATE INDEX IF NOT EXISTS calls_filename ON calls (filename);
+        """)
+
+    def get_stamp(self, filename):
+        with self.lock:
+            return self.conn.execute('SELECT mtime, hash FROM files WHERE filename = ?',
+                (filename,)).fetchone()
+
+    def is_fresh(self, filename):
+        stamp = self.get_stamp(filename)
+        if not stamp:
+            return False
+
+        try:
+            if getmtime(filename) == stamp[0]:
+                return True
+
+            new_stamp = get_file_stamp(filename, open(filename).read())
+        except (IOError, OSError):
+            return False
+
+        if new_stamp[1] != stamp[1]:
+            return False
+
+        with self.lock, self.conn:
+            self.conn.execute('UPDATE files SET mtime = ? WHERE filename = ?',
+                (new_stamp[0], filename))
+
+        return True
+
+    def save(self, filename, stamp, calls):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM calls WHERE filename = ?', (filename,))
+            self.conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?)',
+                (filename,) + tuple(stamp))
+            self.conn.executemany('INSERT INTO calls VALUES (?, ?, ?, ?, ?)',
+                [(filename,) + r for r in calls])
+
+    def remove(self, filename):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM calls WHERE filename = ?', (filename,))
+            self.conn.execute('DELETE FROM files WHERE filename = ?', (filename,))
+
+    def get_callers(self, key):
+        with self.lock:
+            return set(r[0] for r in self.conn.execute(
+                'SELECT DISTINCT filename FROM calls WHERE callee_file IS ? AND callee = ?', key))
+
+    def get_calls(self, filename):
+        with self.lock:
+            return self.conn.execute('SELECT scope, idx, callee_file, callee FROM calls '
+                'WHERE filename = ?', (filename,)).fetchall()
+
+
+class CallInfo(object):
+    """Call site located by caller file and ``(scope name, index)`` position
+
+    Call info doesn't hold caller tree. Arguments are evaluated in the live
+    module scope the call was collected from or in the caller module scope
+    taken from scope cache, so resident trees are bounded by its size.
+
+    :param nargs: number of call arguments
+    :param scope: module scope of the caller, referenced weakly
+    """
+    def __init__(self, calldb, filename, position, nargs, scope=None):
+        self.calldb = calldb
+        self.filename = filename
+        self.position = position
+        self.nargs = nargs
+        self.scope = scope and ref(scope)
+
+    def get_call(self):
+        """Returns scope and argument nodes of the call"""
+        scope = self.scope and self.scope()
+        if not scope:
+            scope = self.calldb.get_file_scope(self.filename)
+
+        for _, s, _, _, args in iter_position_calls(scope, [self.position]):
+            return s, args
+
+        return None, ()
+
+    def get_arg(self, idx):
+        try:
+            scope, args = self.get_call()
+            v = scope.eval(args[idx], False)
+        except BudgetExceeded:
+            raise
+        except:
+            v = None
+        else:
+            if isinstance(v, UnknownObject):
                 v = None
-            else:
-                if isinstance(v, UnknownObject):
-                    v = None
 
-            result.append(v)
+        return v
+
+    def get_args(self):
+        return [self.get_arg(i) for i in range(self.nargs)]
 
-        self._evaluated_args = result
-        return result
+
+class CallSites(object):
+    """Call sites of one callee grouped by caller file
+
+    Files are kept in order of update, iteration starts from the latest one.
+    """
+    def __init__(self):
+        self.files = OrderedDict()
+        self.count = 0
+        self.merged_args = None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for calls in reversed(self.files.values()):
+            for ci in calls:
+                yield ci
+
+    def iter_ranked(self, filename):
+        """Iterates calls from the file first and then from the latest updated ones"""
+        for ci in self.files.get(filename, ()):
+            yield ci
+
+        for fname, calls in reversed(self.files.items()):
+            if fname != filename:
+                for ci in calls:
+                    yield ci
+
+    def set(self, filename, calls):
+        self.remove(filename)
+        self.files[filename] = calls
+        self.count += len(calls)
+
+    def remove(self, filename):
+        self.merged_args = None
+        calls = self.files.pop(filename, None)
+        if calls:
+            self.count -= len(calls)
+
+    def shrink(self, limit):
+        """Drops calls of the oldest files to fit limit
+
+        Returns names of dropped files.
+        """
+        self.merged_args = None
+        dropped = []
+        while self.count > limit and len(self.files) > 1:
+            filename, calls = self.files.popitem(False)
+            self.count -= len(calls)
+            dropped.append(filename)
+
+        if self.count > limit:
+            calls = self.files.values()[0]
+            del calls[limit:]
+            self.count = len(calls)
+
+        return dropped
 
 
 class CallDB(object):
@@ -60,77 +286,279 @@ class CallDB(object):
         self.calls = {}
         self.files = {}
         self.project = project
+        self.progress = None
+        self.max_calls_per_callee = project.config.get('max_calls_per_callee', 100)
+        self.max_evaluated_calls = project.config.get('max_evaluated_calls', 10)
 
-    def update_calls(self, fname, calls):
-        try:
-            fcalls = self.files[fname]
-        except KeyError:
-            fcalls = self.files[fname] = []
+        cache_dir = project.config.get('cache_dir')
+        if cache_dir:
+            if not exists(cache_dir):
+                os.makedirs(cache_dir)
+
+            self.store = CallStore(join(cache_dir, 'calls.sqlite'))
+        else:
+            self.store = None
 
+        self.pending_callers = {}
+
+    def update_calls(self, filename, calls):
+        """Replaces all calls made from the file
+
+        :param calls: list of ``(callee filename, callee fullname, CallInfo)``
+        """
+        new_calls = {}
         for fname, fullname, ci in calls:
-            fcalls.append(ci)
-            self.calls.setdefault((fname, fullname), WeakedList()).append(ci)
+            new_calls.setdefault((fname, fullname), []).append(ci)
+
+        for key in self.files.get(filename, ()):
+            if key not in new_calls:
+                sites = self.calls[key]
+                sites.remove(filename)
+                if not sites.files:
+                    del self.calls[key]
+
+        self.files[filename] = keys = set(new_calls)
+        for key, cis in new_calls.iteritems():
+            try:
+                sites = self.calls[key]
+            except KeyError:
+                sites = self.calls[key] = CallSites()
+
+            sites.set(filename, cis)
+            for dropped in sites.shrink(self.max_calls_per_callee):
+                self.files[dropped].discard(key)
+
+        return keys
 
     def get_args_for_scope(self, scope):
         key = scope.filename, scope.fullname
+        if self.store:
+            self.restore_callers(key)
+
         try:
-            clist = self.calls[key]
+            sites = self.calls[key]
         except KeyError:
             return None
 
+        if sites.merged_args and len(sites.merged_args) == len(scope.args):
+            return sites.merged_args
+
         args = [None] * len(scope.args)
-        for ci in list(clist):
-            for i, v in enumerate(ci.get_args()):
-                if v and args[i] is None:
-                    args[i] = v
+        for ci in islice(sites.iter_ranked(scope.filename), self.max_evaluated_calls):
+            for i in range(min(len(args), ci.nargs)):
+                if args[i] is None:
+                    args[i] = ci.get_arg(i)
 
             if not any(r is None for r in args):
-                return args
+                break
 
         for i, v in enumerate(args):
             if v is None:
                 args[i] = UnknownObject()
 
+        sites.merged_args = args
         return args
 
-    def collect_calls(self, scope, skip_if_exists=False):
-        if skip_if_exists and scope.filename in self.files:
-            return
+    def restore_callers(self, key):
+        """Restores stored callers of the callee until there are enough calls to evaluate"""
+        try:
+            pending = self.pending_callers[key]
+        except KeyError:
+            pending = []
+            for filename in self.store.get_callers(key):
+                if filename not in self.files:
+                    pending.append(filename)
 
-        from .scope import traverse_tree
+            self.pending_callers[key] = pending
+
+        while pending and len(self.calls.get(key, ())) < self.max_evaluated_calls:
+            filename = pending[-1]
+            if filename not in self.files:
+                spend_budget()
+                self.restore_file(filename)
+
+            pending.pop()
 
+    def get_file_scope(self, filename):
+        """Returns module scope of caller file from scope cache
+
+        Files missing in cache are parsed and cached.
+        """
+        if not filename:
+            return None
+
+        cache = self.project.scope_cache
         try:
-            del self.files[scope.filename]
+            return cache.scopes[filename][0]
         except KeyError:
             pass
 
+        tree, source = fix(sanitize_encoding(open(filename).read()))
+        return cache.get(self.project, source, filename, tree)
+
+    def resolve_callee(self, scope, func):
+        """Returns scope of function called from the scope or None"""
+        try:
+            func = scope.eval(func, False)
+        except (AssertionError, BudgetExceeded):
+            raise
+        except:
+            return None
+
+        while getattr(func, 'get_object', None):
+            func = func.get_object()
+
+        if isinstance(func, (ClassName, ClassObject)):
+            func = func['__init__']
+
+        return func and func.get_scope()
+
+    def collect_calls(self, scope, skip_if_exists=False, partial=False):
+        """Collects calls made from module scope
+
+        :param partial: keep calls collected before budget is exceeded
+        """
+        if skip_if_exists and scope.filename in self.files:
+            return
+
+        from .scope import traverse_tree
+
         call_extractor = CallExtractor()
-        for s in traverse_tree(scope):
-            calls = []
-            for line, func, args in call_extractor.process(s.node):
-                if not args: continue
-
-                try:
-                    func = s.eval(func, False)
-                except AssertionError:
-                    raise
-                except:
-                    continue
-
-                while getattr(func, 'get_object', None):
-                    func = func.get_object()
-
-                if isinstance(func, (ClassName, ClassObject)):
-                    func = func['__init__']
-
-                if func:
-                    fscope = func.get_scope()
+        calls = []
+        try:
+            for s in traverse_tree(scope):
+                for idx, (line, func, args) in enumerate(call_extractor.process(s.node)):
+                    if not args: continue
+
+                    fscope = self.resolve_callee(s, func)
                     if fscope:
-                        ci = CallInfo(scope, line, args)
+                        ci = CallInfo(self, scope.filename, (s.fullname, idx), len(args), scope)
                         calls.append((fscope.filename, fscope.fullname, ci))
+        except BudgetExceeded:
+            if not partial:
+                raise
+
+        # Calls are replaced only after successful or partial collection,
+        # interrupted collection keeps previous ones
+        self.update_calls(scope.filename, calls)
+
+    def restore_file(self, filename):
+        """Restores stored calls of unchanged file or collects them again"""
+        from .scope import create_module_scope
+
+        try:
+            content = open(filename).read()
+            stamp = get_file_stamp(filename, content)
+            tree, source = fix(sanitize_encoding(content))
+        except Exception:
+            self.store.remove(filename)
+            return
+
+        stored_stamp = self.store.get_stamp(filename)
+        if not stored_stamp or stamp[1] != stored_stamp[1]:
+            scope = create_module_scope(self.project, source, filename, tree)
+            self.index_file(filename, source, stamp, get_call_positions(scope), scope=scope)
+            return
+
+        scope = create_module_scope(self.project, source, filename, tree)
+        calls = []
+        for pos, s, line, func, args in iter_position_calls(scope, self.store.get_calls(filename)):
+            calls.append((pos[2], pos[3], CallInfo(self, filename, pos[:2], len(args))))
+
+        self.update_calls(filename, calls)
+
+    def get_project_files(self):
+        for path in self.project.sources:
+            for top, dirs, files in os.walk(path):
+                for name in list(dirs):
+                    if name.startswith('.'):
+                        dirs.remove(name)
+
+                for name in files:
+                    if name.endswith('.py'):
+                        yield join(top, name)
+
+    def index_project(self, lock=None, processes=None):
+        """Collects calls from all project source files
+
+        Sources are read, fixed and scanned for calls in a pool of worker
+        processes, calls are resolved in the current thread as soon as file
+        is ready. Files which calls are already collected are skipped.
 
-            self.update_calls(scope.filename, calls)
+        :param lock: lock acquired during resolution of each call
+        :param processes: size of worker pool, cpu count by default. 0 means
+            to prepare sources in the current process.
+        """
+        filenames = []
+        total = 0
+        for filename in self.get_project_files():
+            total += 1
+            if not self.store or not self.store.is_fresh(filename):
+                filenames.append(filename)
+
+        done = total - len(filenames)
+        self.progress = done, total
+        timeout = self.project.config.get('inference_timeout', 3)
+
+        if processes == 0:
+            pool = None
+            results = imap(prepare_source, filenames)
+        else:
+            pool = Pool(processes)
+            results = pool.imap_unordered(prepare_source, filenames)
+
+        try:
+            for done, (filename, source, stamp, positions) in enumerate(results, done + 1):
+                if source is None:
+                    if stamp and self.store:
+                        self.store.save(filename, stamp, [])
+                else:
+                    try:
+                        with Budget(None, timeout, False):
+                            self.index_file(filename, source, stamp, positions, lock)
+                    except BudgetExceeded:
+                        pass
+                    except Exception:
+                        logging.getLogger(__name__).exception('Calls indexing error %s', filename)
+
+                self.progress = done, total
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+
+    def index_file(self, filename, source, stamp, positions, lock=None, scope=None):
+        """Resolves and stores calls of the file at given positions within active budget
+
+        :param lock: lock acquired during evaluation of each call
+        """
+        from .scope import create_module_scope
+
+        if filename in self.files:
+            return
+
+        if not scope:
+            scope = create_module_scope(self.project, source, filename)
+
+        calls = []
+        stored = []
+        for pos, s, line, func, args in iter_position_calls(scope, positions):
+            if lock: lock.acquire()
+            try:
+                fscope = self.resolve_callee(s, func)
+            finally:
+                if lock: lock.release()
+
+            if fscope:
+                ci = CallInfo(self, filename, pos[:2], len(args))
+                calls.append((fscope.filename, fscope.fullname, ci))
+                stored.append((pos[0], pos[1], fscope.filename, fscope.fullname))
+
+        if lock: lock.acquire()
+        try:
+            self.update_calls(filename, calls)
+        finally:
+            if lock: lock.release()
 
-    def index_project(self):
-        for fname, source in self.get_project_sources():
-            pass
\ No newline at end of file
+        if self.store:
+            self.store.save(filename, stamp, stored)
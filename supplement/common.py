@@ -144,6 +144,61 @@ class MethodObject(GetObjectDelegate):
             return None
 
 
+class AttributeTable(object):
+    """Linearized attribute names of a class and its bases
+
+    ``owners`` maps each name to the first class in bases order which defines
+    it. Table remembers generations of modules it was built from and becomes
+    invalid when any of them changes.
+    """
+    def __init__(self, cls, names, bases, module=None):
+        self.owners = dict.fromkeys(names, cls)
+        self.stamps = {}
+        self.volatile = False
+
+        if module is not None:
+            self.stamps[module] = getattr(module, 'generation', 0)
+
+        for base in bases:
+            table = get_attribute_table(base)
+            for name, owner in table.owners.iteritems():
+                if name not in self.owners:
+                    self.owners[name] = owner
+
+            self.stamps.update(table.stamps)
+            self.volatile = self.volatile or table.volatile
+
+        self.names = frozenset(self.owners)
+
+    def is_valid(self):
+        return not self.volatile and not self.is_outdated()
+
+    def is_outdated(self):
+        """Returns True if any module table built from has changed
+
+        Volatile table which is not outdated may be rebuilt from the same
+        bases.
+        """
+        for module, generation in self.stamps.iteritems():
+            if getattr(module, 'generation', 0) != generation:
+                return True
+
+        return False
+
+
+def get_attribute_table(cls):
+    while getattr(cls, 'get_object', None):
+        cls = cls.get_object()
+
+    get_table = getattr(cls, 'get_attribute_table', None)
+    if get_table:
+        return get_table()
+
+    table = AttributeTable(cls, cls.get_names(), ())
+    table.volatile = not isinstance(cls, UnknownObject)
+    return table
+
+
 class ListHolder(GetObjectDelegate):
     def __init__(self, obj, values):
         self.values = values
@@ -0,0 +1,98 @@
+from .fixer import fix, fix_incremental, sanitize_encoding
+
+
+class DocumentError(Exception): pass
+class DocumentOutdated(DocumentError): pass
+
+
+class Document(object):
+    """Snapshot of an editor buffer
+
+    Documents are never modified in place, :meth:`change` returns a new
+    snapshot, so readers can keep using the version they were given.
+    The only exception is ast tree which is handed over to the next version
+    for incremental reparse.
+    """
+
+    def __init__(self, filename, source, version=0):
+        self.filename = filename
+        self.source = source
+        self.version = version
+
+    def __repr__(self):
+        return '<Document %s %s>' % (self.filename, self.version)
+
+    def change(self, changes, version):
+        """Returns new document with applied text range edits
+
+        :param changes: list of ``(start, end, text)`` tuples. ``start`` and
+            ``end`` are character offsets in the source produced by previous edit.
+        :param version: version of resulting document
+        """
+        source = self.source
+        for start, end, text in changes:
+            if not 0 <= start <= end <= len(source):
+                raise DocumentError('Invalid change range (%d, %d) for %s' % (
+                    start, end, self.filename))
+
+            source = source[:start] + text + source[end:]
+
+        doc = Document(self.filename, source, version)
+        if hasattr(self, '_ast'):
+            doc._base = self
+        elif hasattr(self, '_base'):
+            doc._base = self._base
+
+        return doc
+
+    def get_ast(self):
+        """Returns fixed ast tree and fixed source for current version"""
+        try:
+            return self._ast
+        except AttributeError:
+            pass
+
+        source = sanitize_encoding(self.source)
+        base = getattr(self, '_base', None)
+        base_ast = base and base.__dict__.pop('_ast', None)
+        if base_ast:
+            tree, fixed_source = base_ast
+            self._ast = fix_incremental(tree, sanitize_encoding(base.source),
+                fixed_source, source)
+        else:
+            self._ast = fix(source)
+
+        self._base = None
+        return self._ast
+
+
+class DocumentStore(object):
+    def __init__(self):
+        self.documents = {}
+
+    def open(self, filename, source, version=0):
+        doc = self.documents[filename] = Document(filename, source, version)
+        return doc
+
+    def change(self, filename, version, changes):
+        doc = self.documents[filename] = self.get(filename).change(changes, version)
+        return doc
+
+    def close(self, filename):
+        self.documents.pop(filename, None)
+
+    def get(self, filename, version=None):
+        try:
+            doc = self.documents[filename]
+        except KeyError:
+            raise DocumentError('Document %s is not opened' % filename)
+
+        if version is not None and version < doc.version:
+            raise DocumentOutdated('Document %s version %s is outdated by %s' % (
+                filename, version, doc.version))
+
+        if version is not None and doc.version != version:
+            raise DocumentError('Document %s version mismatch: %s requested, %s actual' % (
+                filename, version, doc.version))
+
+        return doc
@@ -1,5 +1,8 @@
 import ast
 import logging
+from time import time
+from threading import local
+from collections import OrderedDict
 
 from .objects import create_object, FakeInstanceObject
 from .common import Value, UnknownObject, Object, create_object_from_seq_item, get_indexes_for_target
@@ -14,6 +17,132 @@ def infer(string, scope, lineno=None):
     return Evaluator().process(tree, scope)
 
 
+class BudgetExceeded(Exception): pass
+
+
+_budgets = local()
+
+class Budget(object):
+    """Limits inference work done in the current thread
+
+    Active budget is set with ``with`` statement. Every evaluation spends one
+    step and :class:`BudgetExceeded` is raised when steps or time run out.
+    Once exceeded budget stays exceeded, so callers can unwind quickly
+    and return partial results.
+
+    :param report: mark request as exceeded, see :func:`pop_budget_exceeded`
+    """
+    def __init__(self, steps=None, timeout=None, report=True):
+        self.steps = steps
+        self.timeout = timeout
+        self.report = report
+        self.exceeded = False
+
+    def __enter__(self):
+        self.deadline = self.timeout and time() + self.timeout
+        self.parent = getattr(_budgets, 'current', None)
+        _budgets.current = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _budgets.current = self.parent
+        if self.exceeded and self.report:
+            _budgets.exceeded = True
+
+    def spend(self):
+        if not self.exceeded:
+            if self.steps is not None:
+                self.steps -= 1
+                self.exceeded = self.steps < 0
+
+            if self.deadline and time() > self.deadline:
+                self.exceeded = True
+
+        if self.exceeded:
+            raise BudgetExceeded()
+
+
+def spend_budget():
+    budget = getattr(_budgets, 'current', None)
+    if budget:
+        budget.spend()
+
+def pop_budget_exceeded():
+    """Returns and resets flag of exceeded budget for the current thread"""
+    exceeded = getattr(_budgets, 'exceeded', False)
+    _budgets.exceeded = False
+    return exceeded
+
+
+class InferenceCache(object):
+    """Keeps inference results between requests
+
+    Each entry remembers filenames of modules requested during its
+    computation and is dropped when any of them changes. ``check`` value
+    guards against changes of the requesting source itself.
+    """
+    def __init__(self, size=1000):
+        self.size = size
+        self.entries = OrderedDict()
+        self.dependents = {}
+        self.recorders = []
+
+    def get(self, key, check, func):
+        try:
+            entry_check, value, deps = self.entries.pop(key)
+        except KeyError:
+            pass
+        else:
+            if entry_check == check:
+                self.entries[key] = entry_check, value, deps
+                return value
+
+            self.remove_dependents(key, deps)
+
+        deps = set()
+        self.recorders.append(deps)
+        try:
+            value = func()
+        finally:
+            self.recorders.remove(deps)
+
+        deps.add(key[0])
+        for filename in deps:
+            self.dependents.setdefault(filename, set()).add(key)
+
+        self.entries[key] = check, value, deps
+        while len(self.entries) > self.size:
+            old_key, (_, _, old_deps) = self.entries.popitem(False)
+            self.remove_dependents(old_key, old_deps)
+
+        return value
+
+    def remove_dependents(self, key, deps):
+        for filename in deps:
+            keys = self.dependents.get(filename)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.dependents[filename]
+
+    def add_dependency(self, module):
+        if self.recorders:
+            filename = getattr(module, 'filename', None)
+            if filename:
+                for deps in self.recorders:
+                    deps.add(filename)
+
+    def invalidate(self, filename):
+        for key in self.dependents.pop(filename, ()):
+            entry = self.entries.pop(key, None)
+            if entry:
+                self.remove_dependents(key, entry[2])
+
+    def clear(self):
+        self.entries.clear()
+        self.dependents.clear()
+
+
 class Slice(Object):
     def __init__(self, upper, lower, step):
         self.upper = upper
@@ -208,6 +337,8 @@ class Evaluator(ast.NodeVisitor):
         if getattr(tree, '_evaluating', False):
             return UnknownObject()
 
+        spend_budget()
+
         self.scope = scope
         self.ops = []
         self.stack = []
@@ -222,7 +353,7 @@ class Evaluator(ast.NodeVisitor):
 
             if len(self.stack) != 1:
                 raise Exception('invalid eval stack:', repr(self.stack))
-        except RecursiveCallException:
+        except (RecursiveCallException, BudgetExceeded):
             raise
         except Exception, e:
             if not getattr(e, '_processed', None):
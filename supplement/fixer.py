@@ -1,5 +1,9 @@
 import re
 import ast
+from bisect import bisect
+from keyword import iskeyword
+from tokenize import (generate_tokens, TokenError, NAME, OP, NL, NEWLINE, COMMENT,
+    INDENT, DEDENT)
 
 match_ws = re.compile('^[ \t]+')
 def get_ws_len(line):
@@ -139,7 +143,111 @@ def try_to_fix(error, code):
 
     return code, None
 
+HEADER_KEYWORDS = set(('if', 'elif', 'while', 'for', 'with', 'except'))
+SKIP_TOKENS = set((NL, COMMENT))
+
+def scan_fixes(code):
+    """Finds common typing errors in one pass over tokens
+
+    Handles dangling attribute access and compound statement headers
+    without colon. Returns list of ``(lineno, col, text, location)``
+    insertions, location is the same as :func:`try_to_fix` one.
+    """
+    fixes = []
+    header = None
+    has_colon = False
+    depth = 0
+    pending = None
+    prev = before = None
+
+    lines = iter([r + '\n' for r in code.split('\n')])
+    try:
+        for tid, value, start, end, _ in generate_tokens(lambda: next(lines)):
+            if tid in SKIP_TOKENS:
+                continue
+
+            if pending:
+                (row, col), text = pending
+                if tid != INDENT:
+                    text += ' pass'
+                fixes.append((row, col, text, ('end-of-line', row)))
+                pending = None
+
+            if (prev and prev[1] == '.' and header != 'from' and value != '.'
+                    and before != '.' and (tid != NAME or iskeyword(value))):
+                row, col = prev[3]
+                fixes.append((row, col, '_someattr', ('line-offset', row, col)))
+
+            if tid == NEWLINE:
+                if header in HEADER_KEYWORDS and not has_colon:
+                    text = ':'
+                    if prev[0] == NAME and iskeyword(prev[1]):
+                        text = ' _somevar:'
+                    pending = prev[3], text
+
+                header = None
+                has_colon = False
+                prev = before = None
+                continue
+
+            if tid == OP:
+                if value in ('(', '[', '{'):
+                    depth += 1
+                elif value in (')', ']', '}'):
+                    depth -= 1
+                elif value == ':' and not depth:
+                    has_colon = True
+
+            if not prev and tid == NAME and (value in HEADER_KEYWORDS or value == 'from'):
+                header = value
+            elif header == 'from' and value == 'import':
+                header = None
+
+            if tid not in (INDENT, DEDENT):
+                before = prev and prev[1]
+                prev = tid, value, start, end
+    except (TokenError, IndentationError, StopIteration):
+        pass
+
+    if pending:
+        (row, col), text = pending
+        fixes.append((row, col, text + ' pass', ('end-of-line', row)))
+
+    return fixes
+
+def apply_fixes(code, fixes):
+    lines = code.split('\n')
+    # Fixes at the same position must keep their order
+    order = sorted(range(len(fixes)), key=lambda i: fixes[i][:2] + (i,), reverse=True)
+    for row, col, text, _ in (fixes[i] for i in order):
+        line = lines[row-1]
+        lines[row-1] = line[:col] + text + line[col:]
+
+    return '\n'.join(lines)
+
 def fix(code, tries=10):
+    """Returns ast tree and source fixed to be parsable"""
+    try:
+        return ast.parse(code), code
+    except Exception:
+        pass
+
+    fixes = scan_fixes(code)
+    if fixes:
+        fixed_code = apply_fixes(code, fixes)
+        try:
+            return ast.parse(fixed_code), fixed_code
+        except Exception:
+            pass
+
+        try:
+            return fix_by_retries(fixed_code, tries)
+        except Exception:
+            pass
+
+    return fix_by_retries(code, tries)
+
+def fix_by_retries(code, tries=10):
     try:
         return ast.parse(code), code
     except Exception, e:
@@ -149,6 +257,104 @@ def fix(code, tries=10):
 
         code, fixed_location = try_to_fix(e, code)
         if fixed_location:
-            return fix(code, tries)
+            return fix_by_retries(code, tries)
         else:
-            raise
\ No newline at end of file
+            raise
+
+def get_changed_lines(old_lines, new_lines):
+    n, m = len(old_lines), len(new_lines)
+    start = 0
+    while start < n and start < m and old_lines[start] == new_lines[start]:
+        start += 1
+
+    end = 0
+    while end < n - start and end < m - start and old_lines[n-end-1] == new_lines[m-end-1]:
+        end += 1
+
+    return start, end
+
+def has_future_imports(body):
+    for node in body:
+        if isinstance(node, ast.ImportFrom) and node.module == '__future__':
+            return True
+
+        if not isinstance(node, ast.Expr) or not isinstance(node.value, ast.Str):
+            return False
+
+    return False
+
+def fix_incremental(tree, code, fixed_code, new_code):
+    """Reparses only top level statements changed between code and new_code
+
+    tree and fixed_code are the result of fix(code). Unchanged statements are
+    reused and their line numbers are shifted in place, so tree must not be
+    used after the call. Falls back to full fix if reuse is not safe, e.g.
+    for modules with __future__ imports which change parsing of the rest.
+
+    Returns the same (tree, fixed_source) pair as fix.
+    """
+    old_lines = code.split('\n')
+    new_lines = new_code.split('\n')
+    fixed_lines = fixed_code.split('\n')
+    body = tree.body
+
+    if not body or len(fixed_lines) != len(old_lines) or has_future_imports(body):
+        return fix(new_code)
+
+    start, end = get_changed_lines(old_lines, new_lines)
+    if start == len(old_lines) == len(new_lines):
+        return tree, fixed_code
+
+    # Find statements overlapping with changed lines [start+1, len(old_lines)-end]
+    starts = [r.lineno for r in body]
+    first = bisect(starts, start + 1) - 1
+    # Edit at statement start can continue previous one, e.g. indented line
+    if first > 0 and starts[first] == start + 1:
+        first -= 1
+
+    while first > 0 and starts[first-1] == starts[first]:
+        first -= 1
+
+    last = max(first, bisect(starts, len(old_lines) - end) - 1)
+    while last + 1 < len(starts) and starts[last+1] == starts[last]:
+        last += 1
+
+    region_start = starts[first] if first >= 0 else 1
+    region_end = starts[last+1] - 1 if last + 1 < len(starts) else len(old_lines)
+
+    # Previous fixes outside the region could be caused by broken code inside it
+    if fixed_code is not code and (old_lines[:region_start-1] != fixed_lines[:region_start-1]
+            or old_lines[region_end:] != fixed_lines[region_end:]):
+        return fix(new_code)
+
+    delta = len(new_lines) - len(old_lines)
+    chunk_lines = new_lines[region_start-1:region_end+delta]
+    chunk = '\n'.join(chunk_lines)
+    try:
+        chunk_tree, chunk_fixed = fix(chunk)
+    except Exception:
+        return fix(new_code)
+
+    if has_future_imports(chunk_tree.body):
+        return fix(new_code)
+
+    if chunk_fixed is not chunk:
+        fixed_chunk_lines = chunk_fixed.split('\n')
+        if len(fixed_chunk_lines) > len(chunk_lines):
+            return fix(new_code)
+
+        fixed_chunk_lines.extend([''] * (len(chunk_lines) - len(fixed_chunk_lines)))
+    else:
+        fixed_chunk_lines = chunk_lines
+
+    ast.increment_lineno(chunk_tree, region_start - 1)
+    tail = body[last+1:]
+    if delta:
+        for node in tail:
+            ast.increment_lineno(node, delta)
+
+    result = ast.Module(body=body[:max(first, 0)] + chunk_tree.body + tail)
+    fixed_source = '\n'.join(fixed_lines[:region_start-1] + fixed_chunk_lines
+        + fixed_lines[region_end:])
+
+    return result, fixed_source
@@ -6,7 +6,8 @@ from cPickle import load
 
 from supplement.names import ClassName
 from supplement.objects import FakeInstanceObject, ClassObject
-from supplement.common import ClassProxy, Object, MethodObject, NoneObject, UnknownObject, GetObjectable
+from supplement.common import ClassProxy, Object, MethodObject, NoneObject, UnknownObject, \
+    GetObjectable, AttributeTable
 
 pydoc_glade_file_matcher = re.compile('(?m)^.*glade-file\s*:(.*)$')
 pygtk_modules = [None]
@@ -124,6 +125,7 @@ class GladeClass(Object):
 class OverrideModule(object):
     def __init__(self, project, module, content):
         self.project = project
+        self.name = module.name
         self.overrided_module = module
         self.content = content
         self._attrs = {}
@@ -136,6 +138,9 @@ class OverrideModule(object):
     def filename(self):
         return None
 
+    def get_package_paths(self):
+        return self.overrided_module.get_package_paths()
+
     def get_names(self):
         return set(self.content).union(self.overrided_module.get_names())
 
@@ -172,6 +177,9 @@ class OverridedClass(ClassObject):
     def get_names(self):
         return self.get_bases()[0].get_names()
 
+    def get_attribute_table(self):
+        return AttributeTable(self, self.content['methods'], self.get_bases())
+
     def __getitem__(self, name):
         try:
             obj = self._attrs[name]
@@ -0,0 +1,291 @@
+"""Module import in worker processes
+
+Modules are imported and introspected by a child process. Module content is
+shipped back as plain data and rebuilt into stub module, classes and
+functions which carry names, signatures, docstrings, class bases and
+definition lines of the originals.
+"""
+import sys
+import logging
+from types import (ModuleType, FunctionType, ClassType, BuiltinFunctionType,
+    MethodType, GetSetDescriptorType, MemberDescriptorType, InstanceType)
+from inspect import getargspec, formatargspec
+from multiprocessing import Pool, TimeoutError
+
+PRIMITIVE_TYPES = (type(None), bool, int, long, float, complex, str, unicode)
+CONTAINER_TYPES = (list, tuple, dict, set, frozenset)
+DESCRIPTOR_TYPES = (property, GetSetDescriptorType, MemberDescriptorType)
+BUILTIN_MODULES = ('__builtin__', 'exceptions')
+MAX_STRING_SIZE = 1000
+
+
+class ImportTimeout(ImportError): pass
+
+
+class ImportEnv(object):
+    """Picklable part of project required for import"""
+    def __init__(self, project):
+        self.root = project.root
+        self.paths = list(project.paths)
+        self.sources = list(project.sources)
+
+
+def introspect_module(env, name):
+    """Imports module and returns its description
+
+    Executed by worker processes.
+    """
+    from .module import _load_module
+
+    try:
+        module = _load_module(env, name, None)
+    except (Exception, SystemExit), e:
+        return 'error', '%s: %s' % (e.__class__.__name__, e)
+
+    return Describer().describe_module(module)
+
+
+class Describer(object):
+    def __init__(self):
+        self.classes = {}
+
+    def describe_module(self, module):
+        attrs = {}
+        for name, value in module.__dict__.items():
+            attrs[name] = self.describe(value)
+
+        return ('module_content', module.__name__, getattr(module, '__file__', None),
+            getattr(module, '__path__', None), module.__doc__, attrs, self.classes)
+
+    def describe(self, obj):
+        obj_type = type(obj)
+        if obj_type in PRIMITIVE_TYPES:
+            if obj_type in (str, unicode) and len(obj) > MAX_STRING_SIZE:
+                obj = obj[:0]
+
+            return 'value', obj
+
+        if obj_type in CONTAINER_TYPES:
+            return 'value', obj_type()
+
+        if obj_type is ModuleType:
+            return 'module', obj.__name__
+
+        if obj_type is ClassType or isinstance(obj, type):
+            return self.describe_class(obj)
+
+        if obj_type is FunctionType:
+            return self.describe_function(obj)
+
+        if obj_type is MethodType:
+            return self.describe(obj.im_func)
+
+        if obj_type is staticmethod or obj_type is classmethod:
+            return obj_type.__name__, self.describe(obj.__get__(None, object))
+
+        if isinstance(obj, DESCRIPTOR_TYPES):
+            return 'property', getattr(obj, '__doc__', None)
+
+        if obj_type is BuiltinFunctionType or callable(obj) and hasattr(obj, '__name__'):
+            return ('builtin', getattr(obj, '__name__', None), getattr(obj, '__module__', None),
+                getattr(obj, '__doc__', None))
+
+        return 'instance', get_class_ref(obj_type)
+
+    def describe_function(self, func):
+        args, varargs, keywords, defaults = getargspec(func)
+        if defaults:
+            defaults = [self.describe(r) for r in defaults]
+
+        code = func.func_code
+        return ('function', func.__name__, func.__module__, func.__doc__,
+            (args, varargs, keywords, defaults), code.co_filename, code.co_firstlineno)
+
+    def describe_class(self, cls):
+        key = id(cls)
+        if key not in self.classes:
+            self.classes[key] = None
+
+            members = {}
+            for name, value in cls.__dict__.items():
+                if name not in ('__dict__', '__weakref__', '__module__', '__doc__'):
+                    members[name] = self.describe(value)
+
+            self.classes[key] = (cls.__name__, cls.__module__, cls.__doc__,
+                [get_class_ref(r) for r in cls.__bases__], members)
+
+        return 'class', key
+
+
+def get_class_ref(cls):
+    return cls.__module__, cls.__name__, type(cls) is ClassType
+
+
+class BuiltinInfo(object):
+    """Stands for builtin function or method without introspectable signature"""
+    def __init__(self, name, module, doc):
+        self.__name__ = name
+        self.__module__ = module
+        self.__doc__ = doc
+
+    def __call__(self, *args, **kwargs):
+        raise TypeError('%s is not callable' % self.__name__)
+
+
+class Builder(object):
+    def __init__(self):
+        self.classes = {}
+        self.placeholders = {}
+
+    def build(self, data):
+        return getattr(self, 'build_' + data[0])(*data[1:])
+
+    def build_module_content(self, name, filename, path, doc, attrs, classes):
+        self.class_data = classes
+        module = ModuleType(name, doc)
+        for attr, value in attrs.iteritems():
+            setattr(module, attr, self.build(value))
+
+        if filename:
+            module.__file__ = filename
+
+        if path is not None:
+            module.__path__ = path
+
+        return module
+
+    def build_value(self, value):
+        return value
+
+    def build_module(self, name):
+        return ModuleType(name)
+
+    def build_property(self, doc):
+        return property(doc=doc)
+
+    def build_staticmethod(self, data):
+        return staticmethod(self.build(data))
+
+    def build_classmethod(self, data):
+        return classmethod(self.build(data))
+
+    def build_builtin(self, name, module, doc):
+        return BuiltinInfo(name, module, doc)
+
+    def build_instance(self, class_ref):
+        module, name, old_style = class_ref
+        cls = self.get_class(module, name, old_style)
+        if type(cls) is ClassType:
+            return InstanceType(cls)
+
+        try:
+            return cls.__new__(cls)
+        except TypeError:
+            cls = self.get_placeholder(module, name, old_style)
+            return cls.__new__(cls)
+
+    def build_function(self, name, module, doc, argspec, filename, lineno):
+        args, varargs, keywords, defaults = argspec
+        if defaults:
+            defaults = tuple(self.build(r) for r in defaults)
+            spec = formatargspec(args, varargs, keywords, (None,) * len(defaults))
+        else:
+            spec = formatargspec(args, varargs, keywords)
+
+        source = '\n' * (max(lineno, 1) - 1) + 'def func%s: pass' % spec
+        ns = {}
+        exec compile(source, filename or '<unknown>', 'exec') in ns
+
+        func = ns['func']
+        func.__name__ = name
+        func.__module__ = module
+        func.__doc__ = doc
+        func.func_defaults = defaults
+        return func
+
+    def build_class(self, key):
+        try:
+            return self.classes[key]
+        except KeyError:
+            pass
+
+        name, module, doc, bases, members = self.class_data[key]
+        bases = tuple(self.get_class(r[0], r[1], r[2]) for r in bases)
+        attrs = {'__module__':module, '__doc__':doc}
+
+        try:
+            cls = type(bases[0])(name, bases, attrs) if bases else ClassType(name, (), attrs)
+        except TypeError:
+            bases = tuple(self.get_placeholder(r[0], r[1], False) for r in bases)
+            cls = type(name, bases, attrs)
+
+        self.classes[key] = cls
+        for attr, value in members.iteritems():
+            try:
+                setattr(cls, attr, self.build(value))
+            except (TypeError, AttributeError):
+                pass
+
+        return cls
+
+    def get_class(self, module, name, old_style):
+        if module in BUILTIN_MODULES:
+            try:
+                return getattr(sys.modules[module], name)
+            except AttributeError:
+                pass
+
+        return self.get_placeholder(module, name, old_style)
+
+    def get_placeholder(self, module, name, old_style):
+        key = module, name, old_style
+        try:
+            return self.placeholders[key]
+        except KeyError:
+            pass
+
+        attrs = {'__module__':module}
+        if old_style:
+            cls = ClassType(name, (), attrs)
+        else:
+            cls = type(name, (object,), attrs)
+
+        self.placeholders[key] = cls
+        return cls
+
+
+class Importer(object):
+    """Imports modules in a pool of child processes
+
+    Hanging imports are interrupted after timeout by pool restart.
+    """
+    def __init__(self, processes=1, timeout=10):
+        self.processes = processes
+        self.timeout = timeout
+        self.pool = None
+
+    def get_pool(self):
+        if not self.pool:
+            self.pool = Pool(self.processes)
+
+        return self.pool
+
+    def restart(self):
+        pool, self.pool = self.pool, None
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    def load(self, project, name):
+        result = self.get_pool().apply_async(introspect_module, (ImportEnv(project), name))
+        try:
+            data = result.get(self.timeout)
+        except TimeoutError:
+            logging.getLogger(__name__).error('Import of %s timed out', name)
+            self.restart()
+            raise ImportTimeout('Import of %s timed out' % name)
+
+        if data[0] == 'error':
+            raise ImportError(data[1])
+
+        return Builder().build(data)
@@ -3,16 +3,37 @@ from os.path import dirname, basename, exists, join, isfile, isdir, normpath, ab
 import os
 import logging
 import imp
+from threading import RLock
 
 from .objects import create_object
 from .tree import NodeProvider
 from .scope import Scope
+from .utils import NameIndex, LRUCache
+from .importer import ImportTimeout
+
+def get_module_weight(name, module):
+    try:
+        return module.get_weight()
+    except AttributeError:
+        return 1
+
 
 class ModuleProvider(object):
-    def __init__(self):
-        self.cache = {}
+    """Resolves module names to module wrappers
+
+    Cache is bounded by module count and by total weight of module names
+    and wrapped objects, which is refreshed on each request of a module.
+    Evicted modules are simply recreated on next request, monitor handlers
+    registered for them look modules up by name and ignore missing ones.
+    """
+    def __init__(self, size=None, weight=None):
+        self.cache = LRUCache(size, weight, get_module_weight, True)
+        self.failed = {}
         self.override = []
 
+    def stats(self):
+        return self.cache.stats()
+
     def add_override(self, override):
         self.override.append(override)
 
@@ -29,6 +50,37 @@ class ModuleProvider(object):
         else:
             m.invalidate()
 
+    def on_path_change(self, path):
+        self.failed.clear()
+
+    def add_failed(self, project, name, key, error):
+        """Remembers failed import of module missing in search path
+
+        The deepest existing package directory of the module is monitored to
+        forget failures when module appears. Errors of existing modules, like
+        import timeouts or exceptions raised by module code, can be transient
+        and are not remembered.
+        """
+        if isinstance(error, ImportTimeout):
+            return
+
+        _, kind = find_module_file(project.paths, name)
+        if kind is not None:
+            return
+
+        self.failed[key] = str(error)
+        parts = name.split('.')[:-1]
+        for p in project.paths:
+            path = p
+            for part in parts:
+                if not isdir(join(path, part)):
+                    break
+
+                path = join(path, part)
+
+            if isdir(path):
+                project.monitor.monitor(path, self.on_path_change)
+
     def get_absolute_name(self, project, name, filename):
         if name[0] == '.':
             assert filename, 'You should provide source filename to resolve relative imports'
@@ -54,15 +106,26 @@ class ModuleProvider(object):
         except KeyError:
             pass
 
+        key = name, tuple(project.paths)
+        if key in self.failed:
+            raise ImportError(self.failed[key])
+
         m = Module(project, name)
         for o in self.override:
             m = o(project, m)
 
         self.cache[name] = m
 
-        filename = m.filename
+        try:
+            filename = m.filename
+        except ImportError, e:
+            del self.cache[name]
+            self.add_failed(project, name, key, e)
+            raise
+
         if filename:
             project.monitor.monitor(filename, self.on_file_change, name)
+            project.monitor.monitor(filename, project.on_file_change)
 
         return m
 
@@ -80,7 +143,53 @@ def get_possible_project_modules(project):
                 if isfile(fname) and n.endswith('.py'):
                     yield n[:-3]
 
+def is_project_module(project, name):
+    return name.partition('.')[0] in get_possible_project_modules(project)
+
+def find_module_file(paths, name):
+    """Locates module file without import
+
+    Returns filename and module type constant from imp module or
+    ``(None, None)`` if module is not found.
+    """
+    filename = None
+    kind = None
+    for part in name.split('.'):
+        if kind is not None and kind != imp.PKG_DIRECTORY:
+            return None, None
+
+        try:
+            f, filename, desc = imp.find_module(part, paths)
+        except ImportError:
+            return None, None
+
+        if f:
+            f.close()
+
+        kind = desc[2]
+        paths = [filename]
+
+    if kind == imp.PKG_DIRECTORY:
+        filename = join(filename, '__init__.py')
+        if not exists(filename):
+            return None, None
+
+        kind = imp.PY_SOURCE
+
+    return filename, kind
+
+# load_module swaps process wide sys.path and sys.modules
+import_lock = RLock()
+
 def load_module(project, name, package_path):
+    importer = getattr(project, 'importer', None)
+    if importer and (name not in sys.modules or is_project_module(project, name)):
+        return importer.load(project, name)
+
+    with import_lock:
+        return _load_module(project, name, package_path)
+
+def _load_module(project, name, package_path):
     pi = set(get_possible_project_modules(project))
 
     bad_modules = {}
@@ -128,8 +237,8 @@ def load_module(project, name, package_path):
 
 
 class PackageResolver(object):
-    def __init__(self):
-        self.cache = {}
+    def __init__(self, size=10000):
+        self.cache = LRUCache(size)
 
     def get(self, path):
         try:
@@ -162,14 +271,26 @@ class ModuleNodeProvider(NodeProvider):
     def get_node(self):
         return self.module.project.get_ast(self.module)
 
+    def __getitem__(self, name):
+        outline = self.module.project.get_outline(self.module)
+        if outline is None:
+            return NodeProvider.__getitem__(self, name)
+
+        return outline.get_outline_node(name)
+
 
 class Module(object):
     def __init__(self, project, name, package_path=None):
         self.project = project
         self.name = name
         self.package_path = package_path
-        self._attrs = {}
+        self._attrs = LRUCache(project.config.get('module_attrs_cache_size', 1000))
         self.node_provider = ModuleNodeProvider(self)
+        self.generation = 0
+
+    def get_weight(self):
+        """Rough estimate of memory held by module names and wrapped objects"""
+        return 1 + len(getattr(self, '_names', ())) + len(self._attrs)
 
     def get_source(self):
         filename = self.filename
@@ -188,25 +309,59 @@ class Module(object):
         return self._module
 
     def invalidate(self):
+        self.generation += 1
+
         try:
             del self._module
         except AttributeError:
             pass
 
+        for attr in ('_names', '_name_index', '_static_filename'):
+            try:
+                delattr(self, attr)
+            except AttributeError:
+                pass
+
+        self._attrs.clear()
+
+    def get_static_filename(self):
+        """Returns source filename if module can be resolved without import
+
+        Static resolution is enabled by ``static_modules`` config option
+        for project modules with python source.
+        """
         try:
-            del self._names
+            return self._static_filename
         except AttributeError:
             pass
 
+        self._static_filename = None
+        project = self.project
+        if project.config.get('static_modules') and is_project_module(project, self.name):
+            filename, kind = find_module_file(project.paths, self.name)
+            if kind == imp.PY_SOURCE:
+                self._static_filename = filename
+
+        return self._static_filename
+
+    def get_package_paths(self):
+        filename = self.get_static_filename()
+        if filename:
+            if basename(filename) == '__init__.py':
+                return [dirname(filename)]
+            return []
+
         try:
-            del self._scope
+            return self.module.__path__
         except AttributeError:
-            pass
-
-        self._attrs.clear()
+            return []
 
     @property
     def filename(self):
+        filename = self.get_static_filename()
+        if filename:
+            return filename
+
         try:
             filename = self.module.__file__
         except AttributeError:
@@ -223,9 +378,24 @@ class Module(object):
         except AttributeError:
             pass
 
-        names = self._names = set(dir(self.module))
+        if self.get_static_filename():
+            scope = self.get_scope()
+            names = set(scope.get_names()) if scope else set()
+        else:
+            names = set(dir(self.module))
+
+        self._names = names
         return names
 
+    def get_name_index(self):
+        try:
+            return self._name_index
+        except AttributeError:
+            pass
+
+        self._name_index = NameIndex(dict.fromkeys(self.get_names(), 0))
+        return self._name_index
+
     def __contains__(self, name):
         return name in self.get_names()
 
@@ -236,6 +406,14 @@ class Module(object):
             if name not in self:
                 raise
 
+        if self.get_static_filename():
+            obj = Scope.get_name(self.get_scope(), name)
+            while getattr(obj, 'get_object', None):
+                obj = obj.get_object()
+
+            self._attrs[name] = obj
+            return obj
+
         obj = self._attrs[name] = create_object(self,
             getattr(self.module, name), self.node_provider[name])
         obj.declared_in = self
@@ -243,21 +421,26 @@ class Module(object):
         return obj
 
     def get_scope(self):
+        scope, digest = self.project.ast_provider.get_scope(self, self.create_scope)
+
+        # Scope of evicted tree is recreated for the same source, names
+        # depend on source only
         try:
-            return self._scope
+            changed = self._digest != digest
         except AttributeError:
-            pass
+            changed = False
 
-        node = self.node_provider.get_node()
+        self._digest = digest
+        if changed and self.get_static_filename():
+            self.invalidate()
 
-        if not node:
-            self._scope = scope = None
-        else:
-            self._scope = scope = DynScope(node, '', None, 'module')
-            scope.project = self.project
-            scope.filename = self.filename
-            scope.module = self
+        return scope
 
+    def create_scope(self, node):
+        scope = DynScope(node, '', None, 'module')
+        scope.project = self.project
+        scope.filename = self.filename
+        scope.module = self
         return scope
 
     def get_scope_at(self, lineno):
@@ -272,7 +455,7 @@ class Module(object):
 
 class DynScope(Scope):
     def get_name(self, name, lineno=None):
-        if lineno is None:
+        if lineno is None and not self.module.get_static_filename():
             try:
                 return self.module[name]
             except KeyError:
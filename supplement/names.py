@@ -2,8 +2,12 @@ import ast
 import logging
 
 from .tree import ReturnExtractor
-from .common import Object, UnknownObject, GetObjectDelegate, Value, MethodObject, \
-    create_object_from_seq_item, get_indexes_for_target
+from .common import Object, UnknownObject, NoneObject, GetObjectDelegate, Value, \
+    MethodObject, ListHolder, create_object_from_seq_item, get_indexes_for_target, \
+    AttributeTable
+from .utils import LRUCache
+
+CALL_RESULTS_SIZE = 20
 
 
 class Valuable(object):
@@ -134,23 +138,73 @@ class RecursiveCallException(Exception):
         return obj is self.object
 
 
+def get_argument_key(obj):
+    """Returns abstract type of call argument for call results cache
+
+    Instances are keyed by their value type or class. Containers keep their
+    items so they are distinguished by identity as well as definitions
+    like functions, classes and modules.
+    """
+    from .objects import FakeInstanceObject, InstanceObject
+    while isinstance(obj, GetObjectDelegate) and not isinstance(obj, (MethodObject, ListHolder)):
+        obj = obj.get_object()
+
+    if isinstance(obj, FakeInstanceObject):
+        return FakeInstanceObject, obj._class
+
+    if isinstance(obj, InstanceObject):
+        return InstanceObject, type(obj.obj)
+
+    obj_type = type(obj)
+    if obj_type is UnknownObject or obj_type is NoneObject:
+        return obj_type
+
+    return obj
+
+
 class FunctionName(NodeLocation, Object):
     def __init__(self, scope, node):
         self.scope = scope
         self.node = node
         self._calling = False
+        self._results = None
+        self._generation = None
 
     def get_scope(self):
         return self.scope
 
+    def get_returns(self):
+        try:
+            return self._returns
+        except AttributeError:
+            pass
+
+        self._returns = ReturnExtractor().process(self.node)
+        return self._returns
+
     def op_call(self, args=[]):
+        # Results depend on module names so they are valid until module scope update
+        generation = self.scope.get_toplevel().generation
+        if generation != self._generation:
+            self._results = LRUCache(CALL_RESULTS_SIZE)
+            self._generation = generation
 
+        key = tuple(get_argument_key(r) for r in args)
+        try:
+            return self._results[key]
+        except KeyError:
+            pass
+
+        result = self._results[key] = self._call(args)
+        return result
+
+    def _call(self, args):
         if self._calling:
             raise RecursiveCallException(self)
 
         self._calling = True
         try:
-            for rvalue in ReturnExtractor().process(self.node):
+            for rvalue in self.get_returns():
                 try:
                     result = self.scope.get_call_scope(args).eval(rvalue, False)
                     if result and type(result) is not Object:
@@ -192,24 +246,37 @@ class ClassName(NodeLocation, Object):
         self._bases = [self.scope.parent.eval(r, False) for r in self.node.bases]
         return self._bases
 
-    def get_names(self):
+    def get_attribute_table(self):
+        try:
+            table = self._attribute_table
+        except AttributeError:
+            pass
+        else:
+            if table.is_valid():
+                return table
+
+            if table.is_outdated():
+                del self._bases
+
         try:
             self._names
         except AttributeError:
             self._names = self.scope.get_names()
 
-        names = set()
-        names.update(self._names)
-        for b in self.get_bases():
-            names.update(b.get_names())
+        top = self.scope.get_toplevel()
+        self._attribute_table = AttributeTable(self, self._names, self.get_bases(),
+            getattr(top, 'module', top))
+        return self._attribute_table
 
-        return names
+    def get_names(self):
+        return self.get_attribute_table().names
 
     def __getitem__(self, name):
-        if name in self.get_names():
-            if name in self._names:
-                return self.scope.get_name(name, self._names[name][-1][0])
+        owner = self.get_attribute_table().owners.get(name)
+        if owner is self:
+            return self.scope.get_name(name, self._names[name][-1][0])
 
+        if owner:
             for cls in self.get_bases():
                 try:
                     return cls[name]
@@ -223,6 +290,12 @@ class ClassName(NodeLocation, Object):
         return FakeInstanceObject(self)
 
     def get_assigned_attributes(self):
+        table = self.get_attribute_table()
+        try:
+            return table.assigned
+        except AttributeError:
+            pass
+
         try:
             self._assigned_attributes
         except AttributeError:
@@ -245,6 +318,7 @@ class ClassName(NodeLocation, Object):
                 if attr not in result:
                     result[attr] = value
 
+        table.assigned = result
         return result
 
     def get_signature(self):
@@ -3,7 +3,8 @@ from types import FunctionType, ClassType, ModuleType, BuiltinFunctionType
 from inspect import getargspec, getdoc
 
 from .tree import CtxNodeProvider
-from .common import Object, GetObjectDelegate, MethodObject, UnknownObject
+from .importer import BuiltinInfo
+from .common import Object, GetObjectDelegate, MethodObject, UnknownObject, AttributeTable
 
 def dir_top(obj):
     try:
@@ -124,7 +125,18 @@ class ClassObject(LocationObject):
 
         return self._bases
 
-    def get_names(self):
+    def get_attribute_table(self):
+        try:
+            table = self._attribute_table
+        except AttributeError:
+            pass
+        else:
+            if table.is_valid():
+                return table
+
+            if table.is_outdated():
+                del self._bases
+
         try:
             self._names
         except AttributeError:
@@ -132,12 +144,12 @@ class ClassObject(LocationObject):
             for k in self.cls.__dict__:
                 self._names.add(k)
 
-        names = set()
-        names.update(self._names)
-        for cls in self.get_bases():
-            names.update(cls.get_names())
+        self._attribute_table = AttributeTable(self, self._names, self.get_bases(),
+            getattr(self, 'declared_in', None))
+        return self._attribute_table
 
-        return names
+    def get_names(self):
+        return self.get_attribute_table().names
 
     def op_call(self, args):
         return FakeInstanceObject(self)
@@ -207,7 +219,18 @@ class FakeInstanceObject(Object):
         self._class = class_obj
 
     def get_names(self):
-        return set(self._class.get_names()).union(set(self._class.get_assigned_attributes()))
+        get_table = getattr(self._class, 'get_attribute_table', None)
+        if not get_table:
+            return set(self._class.get_names()).union(set(self._class.get_assigned_attributes()))
+
+        table = get_table()
+        try:
+            return table.instance_names
+        except AttributeError:
+            pass
+
+        table.instance_names = table.names.union(self._class.get_assigned_attributes())
+        return table.instance_names
 
     def __getitem__(self, name):
         attrs = self._class.get_assigned_attributes()
@@ -322,7 +345,8 @@ def create_object(owner, obj, node=None):
     elif obj_type == ClassType or issubclass(obj_type, type):
         newobj = ClassObject(node, obj)
 
-    elif obj_type == FunctionType or obj_type == BuiltinFunctionType or obj_type == MethodDescriptor:
+    elif (obj_type == FunctionType or obj_type == BuiltinFunctionType
+            or obj_type == MethodDescriptor or obj_type == BuiltinInfo):
         newobj = FunctionObject(node, obj)
 
     else:
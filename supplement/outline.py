@@ -0,0 +1,188 @@
+"""Module outlines
+
+Outline is a compact description of names defined by a module: their kinds,
+definition lines, function arguments, class members and import edges. It
+is enough to answer node provider queries without parsing module source.
+"""
+import os
+import sys
+import ast
+import marshal
+import logging
+from os.path import join, exists
+from hashlib import md5
+
+from .tree import NameExtractor, get_file_stamp
+from .utils import LRUCache
+
+OUTLINE_VERSION = 1
+
+
+def build_outline(tree):
+    """Returns marshalable outline data of module tree"""
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for n in node.names:
+                imports.add(n.name)
+        elif isinstance(node, ast.ImportFrom):
+            imports.add('.' * node.level + (node.module or ''))
+
+    return get_names_outline(tree), sorted(imports)
+
+def get_names_outline(node):
+    result = {}
+    for name, info in NameExtractor().process(node).iteritems():
+        kind = info[0]
+        if kind == 'func':
+            result[name] = kind, info[1].lineno, get_arguments(info[1].args)
+        elif kind == 'class':
+            result[name] = kind, info[1].lineno, get_names_outline(info[1])
+        elif kind == 'assign':
+            result[name] = kind, info[3].lineno, info[1]
+        else:
+            result[name] = info
+
+    return result
+
+def get_arguments(args):
+    names = []
+    for arg in args.args:
+        if isinstance(arg, ast.Name):
+            names.append(arg.id)
+        else:
+            names.append(None)
+
+    return names, args.vararg, args.kwarg, len(args.defaults)
+
+def create_node(data):
+    kind = data[0]
+    if kind == 'func':
+        return kind, OutlineNode(data[1], None, data[2])
+
+    if kind == 'class':
+        return kind, OutlineNode(data[1], data[2])
+
+    if kind == 'assign':
+        return kind, data[2], None, OutlineNode(data[1])
+
+    return data
+
+
+class OutlineNode(object):
+    """Stands for tree node in node provider results
+
+    Nodes are created on demand from outline data and hold only definition
+    line and data of nested names.
+
+    :param names: outline data of nested names
+    :param args: function arguments ``(names, vararg, kwarg, defaults count)``
+    """
+    __slots__ = ('lineno', 'names', 'args')
+
+    def __init__(self, lineno, names=None, args=None):
+        self.lineno = lineno
+        self.names = names
+        self.args = args
+
+    def get_outline_node(self, name):
+        try:
+            data = self.names[name]
+        except (KeyError, TypeError):
+            return None
+
+        return create_node(data)
+
+
+class Outline(OutlineNode):
+    __slots__ = ('imports',)
+
+    def __init__(self, data):
+        names, imports = data
+        OutlineNode.__init__(self, 0, names)
+        self.imports = imports
+
+
+class OutlineProvider(object):
+    """Keeps module outlines
+
+    Outlines are built from module trees which are not retained in ast
+    cache, so only modules evaluated by scope code keep their trees in
+    memory. If cache dir is set outlines are also saved into its
+    ``outlines`` subdirectory in versioned marshal format keyed by file
+    path, mtime, size and interpreter version, so outlines survive server
+    restarts.
+    """
+    def __init__(self, ast_provider, cache_dir=None, size=None):
+        self.ast_provider = ast_provider
+        self.cache = LRUCache(size)
+        self.path = cache_dir and join(cache_dir, 'outlines')
+
+    def stats(self):
+        return self.cache.stats()
+
+    def get(self, module):
+        filename = module.filename
+        stamp = filename and get_file_stamp(filename)
+        if not stamp:
+            return None
+
+        stamp = stamp[:2]
+        try:
+            entry_stamp, outline = self.cache[filename]
+        except KeyError:
+            pass
+        else:
+            if entry_stamp == stamp:
+                return outline
+
+        data = self.load(filename, stamp)
+        if data is None:
+            tree = self.ast_provider.get(module, False)
+            if not tree:
+                return None
+
+            data = build_outline(tree)
+            self.save(filename, stamp, data)
+
+        outline = Outline(data)
+        self.cache[filename] = stamp, outline
+        return outline
+
+    def get_cache_filename(self, filename):
+        return join(self.path, md5(filename + '\0' + sys.version).hexdigest())
+
+    def load(self, filename, stamp):
+        if not self.path:
+            return None
+
+        try:
+            with open(self.get_cache_filename(filename), 'rb') as f:
+                version, pyversion, fname, fstamp, data = marshal.load(f)
+        except (IOError, EOFError, ValueError, TypeError):
+            return None
+
+        if version != OUTLINE_VERSION or pyversion != sys.version:
+            return None
+
+        if fname != filename or fstamp != stamp:
+            return None
+
+        return data
+
+    def save(self, filename, stamp, data):
+        if not self.path:
+            return
+
+        cache_filename = self.get_cache_filename(filename)
+        tmp_filename = '%s.%d' % (cache_filename, os.getpid())
+        try:
+            if not exists(self.path):
+                os.makedirs(self.path)
+
+            with open(tmp_filename, 'wb') as f:
+                marshal.dump((OUTLINE_VERSION, sys.version, filename, stamp, data), f, 2)
+
+            os.rename(tmp_filename, cache_filename)
+        except (IOError, OSError):
+            logging.getLogger(__name__).exception('Can\'t save outline of %s', filename)
@@ -6,6 +6,10 @@ from .tree import AstProvider
 from .module import ModuleProvider, PackageResolver
 from .watcher import DummyMonitor
 from .calls import CallDB
+from .scope import ScopeCache
+from .evaluator import InferenceCache
+from .importer import Importer
+from .outline import OutlineProvider
 
 class Project(object):
     def __init__(self, root, config=None, monitor=None):
@@ -15,9 +19,12 @@ class Project(object):
 
         self.monitor = monitor or DummyMonitor()
 
-        self.ast_provider = AstProvider()
+        self.ast_provider = AstProvider(self.config.get('ast_cache_weight', 1000000))
+        self.outline_provider = OutlineProvider(self.ast_provider,
+            self.config.get('cache_dir'), self.config.get('module_cache_size', 1000))
         self.module_providers = {
-            'default':ModuleProvider()
+            'default':ModuleProvider(self.config.get('module_cache_size', 1000),
+                self.config.get('module_cache_weight', 500000))
         }
         self.package_resolver = PackageResolver()
         self.docstring_processors = []
@@ -28,6 +35,14 @@ class Project(object):
             self.register_hook(h)
 
         self.calldb = CallDB(self)
+        self.scope_cache = ScopeCache(self.config.get('scope_cache_size', 50))
+        self.inference_cache = InferenceCache()
+
+        if self.config.get('import_worker'):
+            self.importer = Importer(self.config.get('import_processes', 1),
+                self.config.get('import_timeout', 10))
+        else:
+            self.importer = None
 
     def _refresh_paths(self):
         self.sources = []
@@ -53,13 +68,32 @@ class Project(object):
             ctx, name = 'default', ctx
 
         if filename:
-            return self.module_providers[ctx].get(self, name, filename)
+            m = self.module_providers[ctx].get(self, name, filename)
         else:
-            return self.module_providers[ctx].get(self, name)
+            m = self.module_providers[ctx].get(self, name)
+
+        self.inference_cache.add_dependency(m)
+        return m
+
+    def on_file_change(self, filename):
+        self.scope_cache.clear()
+        self.inference_cache.invalidate(filename)
+
+    def get_cache_stats(self):
+        return {
+            'modules': self.module_providers['default'].stats(),
+            'ast': self.ast_provider.stats(),
+            'outlines': self.outline_provider.stats(),
+            'packages': self.package_resolver.cache.stats(),
+            'scopes': self.scope_cache.stats(),
+        }
 
     def get_ast(self, module):
         return self.ast_provider.get(module)
 
+    def get_outline(self, module):
+        return self.outline_provider.get(module)
+
     def get_possible_imports(self, start, filename=None):
         result = set()
         if not start:
@@ -68,15 +102,12 @@ class Project(object):
         else:
             m = self.get_module(start, filename)
 
-            sub_package_prefix = m.module.__name__ + '.'
+            sub_package_prefix = m.name + '.'
             for name, module in sys.modules.iteritems():
                 if module and name.startswith(sub_package_prefix):
                     result.add(name[len(sub_package_prefix):])
 
-            try:
-                paths = m.module.__path__
-            except AttributeError:
-                paths = []
+            paths = m.get_package_paths()
 
         for path in paths:
             if not exists(path) or not isdir(path):
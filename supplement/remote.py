@@ -2,8 +2,58 @@ import sys
 import os.path
 import time
 
-from threading import Thread, Lock
-from cPickle import dumps
+from threading import Thread, Lock, Event
+from itertools import count
+from cPickle import dumps, loads
+
+
+class CancelledError(Exception):
+    """Request was superseded by a newer one or by a change of its document"""
+
+
+class Future(object):
+    """Result of a submitted request
+
+    :attr:`info` dict holds additional reply details, e.g. ``budget_exceeded``
+    flag for partial results of interrupted inference.
+    """
+
+    def __init__(self):
+        self._event = Event()
+        self.info = {}
+
+    def done(self):
+        return self._event.is_set()
+
+    def cancelled(self):
+        return self.done() and not self._is_ok and self._result[0] == 'Cancelled'
+
+    def set_result(self, result, is_ok, info=None):
+        self._result = result
+        self._is_ok = is_ok
+        if info:
+            self.info = info
+
+        self._event.set()
+
+    def result(self, timeout=None):
+        """Waits for request completion and returns its result
+
+        :param timeout: seconds to wait, waits forever if None
+        :raises CancelledError: if request was superseded by a newer one or
+            refers to outdated document version
+        :raises Exception: on request error or timeout
+        """
+        if not self._event.wait(timeout):
+            raise Exception('Request timeout exceed')
+
+        if self._is_ok:
+            return self._result
+        elif self.cancelled():
+            raise CancelledError(self._result[1])
+        else:
+            raise Exception(self._result)
+
 
 class Environment(object):
     """Supplement server client"""
@@ -25,6 +75,9 @@ class Environment(object):
         self.prepare_thread = None
         self.prepare_lock = Lock()
 
+        self.send_lock = Lock()
+        self.request_ids = count(1)
+
     def _run(self):
         from subprocess import Popen
         from multiprocessing.connection import Client, arbitrary_address
@@ -58,6 +111,27 @@ class Environment(object):
             else:
                 break
 
+        self.futures = {}
+        t = Thread(target=self._receive, args=(self.conn, self.futures))
+        t.daemon = True
+        t.start()
+
+    def _receive(self, conn, futures):
+        while True:
+            try:
+                reply = loads(conn.recv_bytes())
+            except Exception:
+                break
+
+            future = futures.pop(reply[0], None)
+            if future:
+                future.set_result(*reply[1:])
+
+        for rid in futures.keys():
+            future = futures.pop(rid, None)
+            if future:
+                future.set_result(('ConnectionError', 'Connection closed'), False)
+
     def _threaded_run(self):
         try:
             self._run()
@@ -83,25 +157,72 @@ class Environment(object):
             if not hasattr(self, 'conn'):
                 self._run()
 
-    def _call(self, name, *args, **kwargs):
+    def submit(self, name, *args, **kwargs):
+        """Sends request without waiting for its completion
+
+        Many requests can be in flight on the same connection and they can
+        finish in any order::
+
+            assist = env.submit('assist', project_path, source, position, filename)
+            doc = env.submit('get_docstring', project_path, source, position, filename)
+            match, proposals = assist.result()
+
+        A newer ``assist``, ``get_location`` or ``get_docstring`` request for
+        the same file cancels older requests of the same kind.
+
+        :param name: environment method name, e.g. ``assist`` or ``lint``
+        :returns: :class:`Future` instance
+        """
         try:
             self.conn
         except AttributeError:
             self.run()
 
-        self.conn.send_bytes(dumps((name, args, kwargs), 2))
-        result, is_ok = self.conn.recv()
+        future = Future()
+        with self.send_lock:
+            rid = next(self.request_ids)
+            self.futures[rid] = future
+            self.conn.send_bytes(dumps((rid, name, args, kwargs), 2))
 
-        if is_ok:
-            return result
-        else:
-            raise Exception(result)
+        return future
+
+    def _call(self, name, *args, **kwargs):
+        return self.submit(name, *args, **kwargs).result()
 
     def get_fixed_source(self, project_path, source):
         return self._call('get_fixed_source', project_path, source)
 
-    def lint(self, project_path, source, filename, syntax_only=False):
-        return self._call('lint', project_path, source, filename, syntax_only)
+    def lint(self, project_path, source, filename, syntax_only=False, version=None):
+        return self._call('lint', project_path, source, filename, syntax_only, version=version)
+
+    def open_document(self, filename, source, version=0):
+        """Stores buffer source on server side
+
+        Opened document can be queried by passing None instead of source.
+
+        :param filename: absolute path of file with source code
+        :param source: unicode or byte string code source
+        :param version: document version
+        """
+        return self._call('open_document', filename, source, version)
+
+    def change_document(self, filename, version, changes):
+        """Applies buffer edits to opened document
+
+        :param filename: absolute path of file with source code
+        :param version: document version after edits
+        :param changes: list of ``(start, end, text)`` tuples, replaces characters
+            from ``start`` to ``end`` with ``text``. Offsets of each edit are
+            relative to document with previous edits applied.
+        """
+        return self._call('change_document', filename, version, changes)
+
+    def close_document(self, filename):
+        """Drops opened document
+
+        :param filename: absolute path of file with source code
+        """
+        return self._call('close_document', filename)
 
     def check_syntax(self, source):
         """Checks source syntax against current environment
@@ -111,32 +232,35 @@ class Environment(object):
         """
         return self._call('check_syntax', source)
 
-    def assist(self, project_path, source, position, filename):
+    def assist(self, project_path, source, position, filename, version=None):
         """Return completion match and list of completion proposals
 
         :param project_path: absolute project path
-        :param source: unicode or byte string code source
+        :param source: unicode or byte string code source or None for opened document
         :param position: character or byte cursor position
         :param filename: absolute path of file with source code
+        :param version: expected version of opened document
         :returns: tuple (completion match, sorted list of proposals)
         """
-        return self._call('assist', project_path, source, position, filename)
+        return self._call('assist', project_path, source, position, filename, version=version)
 
-    def get_location(self, project_path, source, position, filename):
+    def get_location(self, project_path, source, position, filename, version=None):
         """Return line number and file path where name under cursor is defined
 
         If line is None location wasn't finded. If file path is None, defenition is located in
         the same source.
 
         :param project_path: absolute project path
-        :param source: unicode or byte string code source
+        :param source: unicode or byte string code source or None for opened document
         :param position: character or byte cursor position
         :param filename: absolute path of file with source code
+        :param version: expected version of opened document
         :returns: tuple (lineno, file path)
         """
-        return self._call('get_location', project_path, source, position, filename)
+        return self._call('get_location', project_path, source, position, filename,
+            version=version)
 
-    def get_docstring(self, project_path, source, position, filename):
+    def get_docstring(self, project_path, source, position, filename, version=None):
         """Return signature and docstring for current cursor call context
 
         Some examples of call context::
@@ -150,12 +274,14 @@ class Environment(object):
         Signature and docstring can be None
 
         :param project_path: absolute project path
-        :param source: unicode or byte string code source
+        :param source: unicode or byte string code source or None for opened document
         :param position: character or byte cursor position
         :param filename: absolute path of file with source code
+        :param version: expected version of opened document
         :returns: tuple (signarure, docstring)
         """
-        return self._call('get_docstring', project_path, source, position, filename)
+        return self._call('get_docstring', project_path, source, position, filename,
+            version=version)
 
     def configure_project(self, project_path, config):
         """Reconfigure project
@@ -165,7 +291,7 @@ class Environment(object):
         """
         return self._call('configure_project', project_path, config)
 
-    def get_scope(self, project_path, source, lineno, filename, continous=True):
+    def get_scope(self, project_path, source, lineno, filename, continous=True, version=None):
         """
         Return scope name at cursor position
 
@@ -181,12 +307,44 @@ class Environment(object):
         get_scope return Foo.foo if continuous is True and Foo otherwise.
 
         :param project_path: absolute project path
-        :param source: unicode or byte string code source
+        :param source: unicode or byte string code source or None for opened document
         :param position: character or byte cursor position
         :param filename: absolute path of file with source code
         :param continous: allow parent scope beetween children if False
+        :param version: expected version of opened document
+        """
+        return self._call('get_scope', project_path, source, lineno, filename,
+            continous=continous, version=version)
+
+    def index_project(self, project_path):
+        """Starts background collection of call sites from all project sources
+
+        Collected calls provide argument types for function parameters
+        without visiting every caller.
+
+        :param project_path: absolute project path
+        """
+        return self._call('index_project', project_path)
+
+    def get_index_progress(self, project_path):
+        """Returns indexing progress
+
+        :param project_path: absolute project path
+        :returns: tuple (processed files count, total files count) or None if
+            indexing was not started
+        """
+        return self._call('get_index_progress', project_path)
+
+    def get_cache_stats(self, project_path):
+        """Returns statistics of project caches
+
+        :param project_path: absolute project path
+        :returns: dict of cache name (``modules``, ``ast``, ``outlines``,
+            ``packages``, ``scopes``) to dict with ``count``, ``weight``, ``hits``,
+            ``misses`` and ``evictions`` keys. Module weight is an estimate
+            of held names and objects, ast weight is a count of tree nodes.
         """
-        return self._call('get_scope', project_path, source, lineno, filename, continous=continous)
+        return self._call('get_cache_stats', project_path)
 
     def eval(self, source):
         return self._call('eval', source)
@@ -199,6 +357,7 @@ class Environment(object):
         except AttributeError:
             pass
         else:
-            self.conn.send_bytes(dumps(('close', (), {}), 2))
-            self.conn.close()
+            with self.send_lock:
+                self.conn.send_bytes(dumps(('close', (), {}), 2))
+                self.conn.close()
             del self.conn
@@ -6,6 +6,7 @@ from .evaluator import Evaluator
 from .names import NameExtractor, create_name, ArgumentName, VarargName
 from .names import ClassName, FunctionName, ImportedName, PostponedName
 from .common import ListHolder, create_object_from_class_name, create_object_from_expr
+from .utils import NameIndex, LRUCache
 
 def traverse_tree(root):
     yield root
@@ -14,15 +15,64 @@ def traverse_tree(root):
             yield r
 
 def get_scope_at(project, source, lineno, filename=None, ast_node=None, continous=True):
-    ast_node = ast_node or ast.parse(source)
+    if filename:
+        scope = project.scope_cache.get(project, source, filename, ast_node)
+    else:
+        scope = create_module_scope(project, source, filename, ast_node)
 
-    scope = Scope(ast_node, '', None, 'module')
+    return scope.get_scope_at(source, lineno, continous)
+
+def create_module_scope(project, source, filename, ast_node=None):
+    scope = Scope(ast_node or ast.parse(source), '', None, 'module')
     scope.project = project
     scope.filename = filename
-    return scope.get_scope_at(source, lineno, continous)
+    return scope
+
+
+class ScopeCache(object):
+    """Keeps last module scope for each file
+
+    Scope is reused as is for the same source. For changed source it is
+    updated in place and child scopes which nodes remain in the new tree
+    keep their caches. Unchanged top level nodes are preserved by
+    incremental document reparse.
+
+    Cached scopes refer to names from other modules, so any module change
+    drops the whole cache.
+
+    :param size: maximum number of files which scopes are kept, least
+        recently used ones are dropped first
+    """
+    def __init__(self, size=None):
+        self.scopes = LRUCache(size)
+
+    def get(self, project, source, filename, ast_node=None):
+        try:
+            scope, cached_source = self.scopes[filename]
+        except KeyError:
+            scope = None
+        else:
+            if cached_source == source:
+                return scope
+
+        if scope:
+            scope.replace_node(ast_node or ast.parse(source))
+        else:
+            scope = create_module_scope(project, source, filename, ast_node)
+
+        self.scopes[filename] = scope, source
+        return scope
+
+    def clear(self):
+        self.scopes.clear()
+
+    def stats(self):
+        return self.scopes.stats()
 
 
 class Scope(object):
+    line_caches = ('children', '_names', '_name_index', '_scope_ranges')
+
     def __init__(self, node, name, parent, scope_type):
         self.node = node
         self.name = name
@@ -33,6 +83,7 @@ class Scope(object):
 
         if scope_type == 'module':
             node.lineno = 0
+            self.generation = 0
 
         if parent:
             self.project = parent.project
@@ -43,6 +94,8 @@ class Scope(object):
         else:
             self.fullname = name
 
+        self._lineno = self.get_lineno()
+
     def get_toplevel(self):
         scope = self
         while scope.parent:
@@ -65,9 +118,82 @@ class Scope(object):
         except AttributeError:
             pass
 
-        self.children = ScopeExtractor().process(self)
+        self.children = ScopeExtractor().process(self, getattr(self, '_reusable', None))
+        self._reusable = None
         return self.children
 
+    def get_child_by_node(self, node):
+        """Returns child scope for node without creating other children"""
+        try:
+            children = self.children
+        except AttributeError:
+            pass
+        else:
+            for c in children:
+                if c.node is node:
+                    return c
+
+            raise KeyError(node)
+
+        reusable = getattr(self, '_reusable', None)
+        if reusable is None:
+            reusable = self._reusable = {}
+
+        try:
+            return reusable[node].reuse()
+        except KeyError:
+            pass
+
+        scope = ScopeExtractor().create(self, node)
+        if not scope:
+            raise KeyError(node)
+
+        reusable[node] = scope
+        return scope
+
+    def replace_node(self, node):
+        """Updates scope with new ast tree
+
+        Child scopes with nodes from the new tree are reused.
+        """
+        try:
+            self._reusable = dict((c.node, c) for c in self.children)
+        except AttributeError:
+            pass
+
+        for attr in self.line_caches:
+            try:
+                delattr(self, attr)
+            except AttributeError:
+                pass
+
+        self.node = node
+        if self.type == 'module':
+            node.lineno = 0
+            self.generation += 1
+
+        self._lineno = self.get_lineno()
+        self._attrs.clear()
+        self.node2scope.clear()
+
+    def reuse(self):
+        """Returns scope prepared for reuse in the updated parent tree
+
+        Incremental reparse shifts line numbers of unchanged nodes in place, so
+        line dependent caches of moved scope are dropped.
+        """
+        if self.get_lineno() == self._lineno:
+            return self
+
+        self.replace_node(self.node)
+        if self.type == 'func':
+            self.defaults = []
+            self.function = create_name((FunctionName, self, self.node), self)
+        elif self.type == 'class':
+            self.cls = create_name((ClassName, self, self.node), self)
+
+        return self
+
     def get_child_by_name(self, name):
         for c in self.get_children():
             if c.name == name:
@@ -104,12 +230,18 @@ class Scope(object):
         if lineno is None:
             return self._names
 
-        result = []
-        for name, names in self._names.iteritems():
-            if any(line <= lineno for line, _ in names):
-                result.append(name)
+        return self.get_name_index().visible(lineno)
 
-        return result
+    def get_name_index(self):
+        try:
+            return self._name_index
+        except AttributeError:
+            pass
+
+        self._name_index = NameIndex(dict((name, min(line for line, _ in names))
+            for name, names in self.get_names().iteritems()))
+
+        return self._name_index
 
     def __contains__(self, name):
         return name in self.get_names()
@@ -170,7 +302,8 @@ class Scope(object):
 
         lines, scopes = ranges
         idx = bisect(lines, lineno) - 1
-        node, end, parent = scopes[idx]
+        lrange = scopes[idx]
+        node, end, parent = lrange
         cadd = 0
 
         if end and not continous:
@@ -183,13 +316,31 @@ class Scope(object):
             cadd = end - i - 2
 
         while parent and end and lineno >= end - cadd:
-            node, end, parent = parent
+            lrange = parent
+            node, end, parent = lrange
 
         try:
             return self.node2scope[node]
         except KeyError:
             pass
 
+        # Descend from the top by nesting chain creating only scopes on the path
+        path = []
+        while lrange:
+            path.append(lrange[0])
+            lrange = lrange[2]
+
+        if path[-1] is self.node:
+            scope = self
+            try:
+                for n in reversed(path[:-1]):
+                    scope = scope.get_child_by_node(n)
+            except KeyError:
+                pass
+            else:
+                self.node2scope[node] = scope
+                return scope
+
         for s in traverse_tree(self):
             if s.node is node:
                 self.node2scope[node] = s
@@ -306,6 +457,8 @@ class StaticScope(object):
 
 
 class InnerScope(Scope):
+    line_caches = ('children', '_scope_ranges')
+
     def __init__(self, node, parent):
         Scope.__init__(self, node, parent.name, parent, 'inner')
         self.fullname = parent.fullname
@@ -317,6 +470,9 @@ class InnerScope(Scope):
     def get_names(self, lineno=None):
         return self._names
 
+    def get_name_index(self):
+        return NameIndex(dict.fromkeys(self._names, 0))
+
     def get_name(self, name, lineno=None):
         return self._names[name]
 
@@ -333,6 +489,13 @@ class InnerScope(Scope):
 
 
 class ScopeExtractor(ast.NodeVisitor):
+    def visit(self, node):
+        scope = self.reusable.get(node)
+        if scope is None:
+            return ast.NodeVisitor.visit(self, node)
+
+        self.children.append(scope.reuse())
+
     def visit_FunctionDef(self, node):
         scope = Scope(node, node.name, self.scope, 'func')
         scope.args = {}
@@ -361,9 +524,18 @@ class ScopeExtractor(ast.NodeVisitor):
         scope.cls = create_name((ClassName, scope, node), scope)
         self.children.append(scope)
 
-    def process(self, scope):
+    def create(self, scope, node):
+        self.children = []
+        self.scope = scope
+        self.reusable = {}
+        ast.NodeVisitor.visit(self, node)
+
+        return self.children[0] if self.children else None
+
+    def process(self, scope, reusable=None):
         self.children = []
         self.scope = scope
+        self.reusable = reusable or {}
         self.generic_visit(scope.node)
 
         return self.children
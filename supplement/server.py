@@ -2,6 +2,9 @@ import sys
 import os.path
 import logging
 
+from threading import Thread, Lock
+from Queue import Queue
+
 logger = logging.getLogger('server')
 
 try:
@@ -34,15 +37,38 @@ from supplement.scope import get_scope_at
 from supplement.watcher import get_monitor
 from supplement.fixer import sanitize_encoding
 from supplement.linter import lint, check_syntax
+from supplement.document import DocumentStore, DocumentOutdated
+from supplement.evaluator import pop_budget_exceeded
+
+# Calls which touch project state and must not run concurrently for the same project
+PROJECT_CALLS = set(('configure_project', 'get_fixed_source', 'assist', 'get_location',
+    'get_docstring', 'get_scope', 'get_cache_stats'))
+
+# Calls which are made obsolete by a newer call of any of them for the same file
+SUPERSEDABLE_CALLS = set(('assist', 'get_location', 'get_docstring'))
+
+# Document notifications are cheap and processed in the order of arrival
+DOCUMENT_CALLS = set(('open_document', 'change_document', 'close_document'))
+
+CANCELLED = 'Cancelled', 'Superseded by newer request'
 
 class Server(object):
-    def __init__(self, conn):
+    def __init__(self, conn, workers=4):
         self.conn = conn
         self.projects = {}
         self.configs = {}
         self.monitor = get_monitor()
         self.monitor.start()
 
+        self.workers = workers
+        self.tasks = Queue()
+        self.send_lock = Lock()
+        self.locks_lock = Lock()
+        self.project_locks = {}
+        self.latest_requests = {}
+        self.documents = DocumentStore()
+        self.indexers = {}
+
     def configure_project(self, path, config):
         self.configs[path] = config
         self.projects[path] = self.create_project(path)
@@ -66,6 +92,9 @@ class Server(object):
         try:
             is_ok = True
             result = getattr(self, name)(*args, **kwargs)
+        except DocumentOutdated:
+            is_ok = False
+            result = CANCELLED
         except Exception as e:
             logger.exception('%s error', name)
             is_ok = False
@@ -73,24 +102,146 @@ class Server(object):
 
         return result, is_ok
 
-    def get_fixed_source(self, path, source):
-        return get_fixed_source(self.get_project(path), source)
+    def get_project_lock(self, path):
+        with self.locks_lock:
+            try:
+                return self.project_locks[path]
+            except KeyError:
+                lock = self.project_locks[path] = Lock()
+                return lock
+
+    def get_supersede_key(self, name, args, kwargs):
+        if name not in SUPERSEDABLE_CALLS:
+            return None
+
+        try:
+            return name, args[0], args[3]
+        except IndexError:
+            return name, args[0], kwargs.get('filename')
+
+    def register_request(self, rid, name, args, kwargs):
+        key = self.get_supersede_key(name, args, kwargs)
+        if key:
+            with self.locks_lock:
+                self.latest_requests[key] = max(rid, self.latest_requests.get(key, rid))
+
+    def is_superseded(self, rid, key):
+        # Request ids are monotonic, latest id is kept after completion, so
+        # older request can't run after a newer one took the project lock
+        with self.locks_lock:
+            return rid < self.latest_requests.get(key, rid)
+
+    def process_task(self, rid, name, args, kwargs):
+        key = self.get_supersede_key(name, args, kwargs)
+        pop_budget_exceeded()
+        if name in PROJECT_CALLS:
+            with self.get_project_lock(args[0]):
+                if key and self.is_superseded(rid, key):
+                    result, is_ok = CANCELLED, False
+                else:
+                    result, is_ok = self.process(name, args, kwargs)
+        else:
+            result, is_ok = self.process(name, args, kwargs)
+
+        if key and self.is_superseded(rid, key):
+            result, is_ok = CANCELLED, False
+
+        if pop_budget_exceeded() and is_ok:
+            self.send(rid, result, is_ok, {'budget_exceeded': True})
+        else:
+            self.send(rid, result, is_ok)
+
+    def worker(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+
+            self.process_task(*task)
+
+    def start_workers(self):
+        for _ in range(self.workers):
+            t = Thread(target=self.worker)
+            t.daemon = True
+            t.start()
+
+    def stop_workers(self):
+        for _ in range(self.workers):
+            self.tasks.put(None)
 
-    def assist(self, path, source, position, filename):
-        return assist(self.get_project(path), source, position, filename)
+    def send(self, *reply):
+        try:
+            with self.send_lock:
+                self.conn.send_bytes(dumps(reply, 2))
+        except:
+            logger.exception('Send error')
+
+    def open_document(self, filename, source, version=0):
+        self.documents.open(filename, source, version)
+
+    def change_document(self, filename, version, changes):
+        self.documents.change(filename, version, changes)
+
+    def close_document(self, filename):
+        self.documents.close(filename)
+
+    def get_document(self, filename, source, version):
+        """Returns source and document for queries which refer to opened document
+
+        Source is None for such queries.
+        """
+        if source is not None:
+            return source, None
+
+        doc = self.documents.get(filename, version)
+        return doc.source, doc
+
+    def get_fixed_source(self, path, source, filename=None, version=None):
+        source, doc = self.get_document(filename, source, version)
+        return get_fixed_source(self.get_project(path), source, doc)
+
+    def assist(self, path, source, position, filename, version=None):
+        source, doc = self.get_document(filename, source, version)
+        return assist(self.get_project(path), source, position, filename, doc)
+
+    def get_location(self, path, source, position, filename, version=None):
+        source, doc = self.get_document(filename, source, version)
+        return get_location(self.get_project(path), source, position, filename, doc)
+
+    def get_docstring(self, path, source, position, filename, version=None):
+        source, doc = self.get_document(filename, source, version)
+        return get_docstring(self.get_project(path), source, position, filename, doc)
 
-    def get_location(self, path, source, position, filename):
-        return get_location(self.get_project(path), source, position, filename)
+    def get_scope(self, path, source, lineno, filename, continous, version=None):
+        source, doc = self.get_document(filename, source, version)
+        if doc:
+            ast_node, source = doc.get_ast()
+        else:
+            ast_node, source = None, sanitize_encoding(source)
 
-    def get_docstring(self, path, source, position, filename):
-        return get_docstring(self.get_project(path), source, position, filename)
+        return get_scope_at(self.get_project(path), source, lineno,
+            filename, ast_node, continous=continous).fullname
 
-    def get_scope(self, path, source, lineno, filename, continous):
-        return get_scope_at(
-            self.get_project(path), sanitize_encoding(source), lineno,
-                filename, continous=continous).fullname
+    def index_project(self, path):
+        lock = self.get_project_lock(path)
+        with lock:
+            t = self.indexers.get(path)
+            if t and t.is_alive():
+                return
 
-    def lint(self, path, source, filename, syntax_only):
+            t = self.indexers[path] = Thread(target=self.get_project(path).calldb.index_project,
+                args=(lock,))
+            t.daemon = True
+            t.start()
+
+    def get_index_progress(self, path):
+        return self.get_project(path).calldb.progress
+
+    def get_cache_stats(self, path):
+        return self.get_project(path).get_cache_stats()
+
+    def lint(self, path, source, filename, syntax_only, version=None):
+        source, _ = self.get_document(filename, source, version)
         return lint(source)
 
     def check_syntax(self, source):
@@ -104,26 +255,54 @@ class Server(object):
         return ctx['result']
 
     def run(self):
+        """Serves requests until connection close
+
+        Messages ``(name, args, kwargs)`` are processed synchronously in the
+        order of arrival and replied with ``(result, is_ok)``.
+
+        Messages ``(request_id, name, args, kwargs)`` are dispatched to worker
+        pool and replied with ``(request_id, result, is_ok)`` as soon as they are
+        done. Calls for the same project are serialized. ``assist``,
+        ``get_location`` and ``get_docstring`` requests superseded by a newer
+        request of the same kind for the same file are replied with
+        ``Cancelled`` error as well as queries for document version outdated
+        by a later change. Replies with
+        partial results due to exceeded inference budget have additional
+        ``{'budget_exceeded': True}`` info element.
+        """
         conn = self.conn
-        while True:
-            if conn.poll(1):
-                try:
-                    args = loads(conn.recv_bytes())
-                except EOFError:
-                    break
-                except Exception:
-                    logger.exception('IO error')
-                    break
-
-                if args[0] == 'close':
-                    conn.close()
-                    break
-                else:
-                    result, is_ok = self.process(*args)
+        self.start_workers()
+        try:
+            while True:
+                if conn.poll(1):
                     try:
-                        self.conn.send_bytes(dumps((result, is_ok), 2))
-                    except:
-                        logger.exception('Send error')
+                        args = loads(conn.recv_bytes())
+                    except EOFError:
+                        break
+                    except Exception:
+                        logger.exception('IO error')
+                        break
+
+                    if args[0] == 'close':
+                        conn.close()
+                        break
+                    elif len(args) == 4 and args[1] in DOCUMENT_CALLS:
+                        rid, name, args, kwargs = args
+                        self.send(rid, *self.process(name, args, kwargs))
+                    elif len(args) == 4:
+                        self.register_request(*args)
+                        self.tasks.put(args)
+                    else:
+                        name = args[0]
+                        if name in PROJECT_CALLS:
+                            with self.get_project_lock(args[1][0]):
+                                result, is_ok = self.process(*args)
+                        else:
+                            result, is_ok = self.process(*args)
+
+                        self.send(result, is_ok)
+        finally:
+            self.stop_workers()
 
 if __name__ == '__main__':
     from multiprocessing.connection import Listener
@@ -141,5 +320,5 @@ if __name__ == '__main__':
 
     listener = Listener(sys.argv[1])
     conn = listener.accept()
-    server = Server(conn)
+    server = Server(conn, int(os.environ.get('SUPP_WORKERS', 4)))
     server.run()
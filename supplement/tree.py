@@ -1,29 +1,95 @@
+import os
 import ast
+from hashlib import md5
 
 from .fixer import fix
+from .utils import LRUCache
 
 UNSUPPORTED_ASSIGNMENTS = ast.Subscript, ast.Attribute
 
 
+def get_tree_weight(key, entry):
+    tree = entry[2]
+    if not tree:
+        return 1
+
+    return sum(1 for _ in ast.walk(tree))
+
+def get_file_stamp(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+
+    return st.st_mtime, st.st_size, st.st_ino
+
+
 class AstProvider(object):
-    def __init__(self):
-        self.cache = {}
+    """Keeps parsed module trees and module scopes built from them
+
+    Trees of module files are validated by file stat on each request and
+    source hash is checked on stat mismatch, so changed files are reparsed
+    before monitor notices them and touched but unchanged ones are not.
+
+    Cache is bounded by total count of tree nodes. Module scopes are kept
+    in the tree entry and dropped with it, so the limit covers all trees
+    retained for evaluation.
+    """
+    def __init__(self, weight=None):
+        self.cache = LRUCache(weight=weight, weigh=get_tree_weight)
+
+    def stats(self):
+        return self.cache.stats()
+
+    def get_entry(self, module, cache=True):
+        """Returns ``[stamp, digest, tree, scope]`` list for the module
+
+        :param cache: keep entry of parsed tree in cache
+        """
+        filename = module.filename
+        stamp = filename and get_file_stamp(filename)
+        key = filename if stamp else module.name
 
-    def get(self, module):
         try:
-            return self.cache[module.name]
+            entry = self.cache[key]
         except KeyError:
-            pass
+            entry = None
+        else:
+            if not stamp or entry[0] == stamp:
+                return entry
 
         source = module.get_source()
-        if source:
+        digest = source and md5(source).digest()
+        if entry and entry[1] == digest:
+            entry = [stamp, digest, entry[2], entry[3]]
+        elif source:
             tree, _ = fix(source)
+            entry = [stamp, digest, tree, None]
         else:
-            tree = None
+            entry = [stamp, digest, None, None]
+
+        if cache:
+            self.cache[key] = entry
+
+        return entry
+
+    def get(self, module, cache=True):
+        """Returns module tree
 
-        self.cache[module.name] = tree
+        :param cache: keep parsed tree in cache
+        """
+        return self.get_entry(module, cache)[2]
 
-        return tree
+    def get_scope(self, module, factory):
+        """Returns module scope and source digest
+
+        Scope is created by ``factory`` from module tree once per tree.
+        """
+        entry = self.get_entry(module)
+        if entry[3] is None and entry[2]:
+            entry[3] = factory(entry[2])
+
+        return entry[3], entry[1]
 
 
 class NodeProvider(object):
@@ -31,17 +97,28 @@ class NodeProvider(object):
         raise NotImplementedError()
 
     def __getitem__(self, name):
+        node = self.get_node()
+        if not node:
+            return ('undefined', None)
+
         try:
-            return self.nodes.get(name, None)
+            get_outline_node = node.get_outline_node
         except AttributeError:
             pass
+        else:
+            return get_outline_node(name)
 
-        node = self.get_node()
-        if not node:
-            return ('undefined', None)
+        try:
+            nodes_tree, nodes = self.nodes
+        except AttributeError:
+            pass
         else:
-            self.nodes = NameExtractor().process(self.get_node())
-            return self.nodes.get(name, None)
+            if nodes_tree is node:
+                return nodes.get(name, None)
+
+        nodes = NameExtractor().process(node)
+        self.nodes = node, nodes
+        return nodes.get(name, None)
 
 
 class CtxNodeProvider(NodeProvider):
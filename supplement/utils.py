@@ -1,18 +1,161 @@
-from weakref import ref
+from bisect import bisect, bisect_left
+from collections import OrderedDict
 
-class WeakedList(object):
-    def __init__(self):
-        self.list = []
+class NameIndex(object):
+    """Sorted names for prefix and definition line queries
+
+    :param names: dict of name to the first line where name is defined
+    """
+    def __init__(self, names):
+        self.first_lines = names
+        self.names = sorted(names)
+
+        by_line = sorted((line, name) for name, line in names.iteritems())
+        self.lines = [r[0] for r in by_line]
+        self.line_names = [r[1] for r in by_line]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def visible(self, lineno):
+        """Returns names defined at or before lineno"""
+        return self.line_names[:bisect(self.lines, lineno)]
+
+    def at(self, lineno):
+        return LineNameIndex(self, lineno)
+
+    def select(self, prefix, lineno=None):
+        """Returns sorted names starting with prefix"""
+        names = self.names
+        idx = bisect_left(names, prefix)
+        end = idx
+        count = len(names)
+        while end < count and names[end].startswith(prefix):
+            end += 1
+
+        if lineno is None:
+            return names[idx:end]
+
+        first_lines = self.first_lines
+        return [r for r in names[idx:end] if first_lines[r] <= lineno]
+
+
+class LineNameIndex(object):
+    """NameIndex view with names defined at or before lineno"""
+    def __init__(self, index, lineno):
+        self.index = index
+        self.lineno = lineno
 
     def __iter__(self):
-        for r in self.list:
-            yield r()
+        return iter(self.index.visible(self.lineno))
+
+    def select(self, prefix):
+        return self.index.select(prefix, self.lineno)
+
+
+class LRUCache(object):
+    """Dict-like cache with least recently used eviction
+
+    :param size: maximum number of entries, None for unlimited
+    :param weight: maximum total weight of entries, None for unlimited
+    :param weigh: function of key and value returning estimated entry size.
+        Weights are taken on insertion and refreshed by :meth:`stats`.
+        Each entry weighs 1 without it.
+    :param reweigh: also refresh entry weight on each hit, for cheap weigh
+        functions of growing values
+    """
+    def __init__(self, size=None, weight=None, weigh=None, reweigh=False):
+        self.size = size
+        self.max_weight = weight
+        self.weigh = weigh
+        self.reweigh = reweigh
+        self.entries = OrderedDict()
+        self.weights = {}
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
     def __len__(self):
-        return len(self.list)
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            raise
+
+        self.entries[key] = value
+        self.hits += 1
+        if self.reweigh and self.weigh:
+            weight = self.weigh(key, value)
+            self.weight += weight - self.weights[key]
+            self.weights[key] = weight
+            self.evict()
+
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self.entries:
+            del self[key]
+
+        self.entries[key] = value
+        weight = self.weigh(key, value) if self.weigh else 1
+        self.weights[key] = weight
+        self.weight += weight
+        self.evict()
+
+    def __delitem__(self, key):
+        del self.entries[key]
+        self.weight -= self.weights.pop(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, *default):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+
+        del self[key]
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.weights.clear()
+        self.weight = 0
+
+    def evict(self):
+        entries = self.entries
+        while entries and (self.size is not None and len(entries) > self.size
+                or self.max_weight is not None and self.weight > self.max_weight
+                    and len(entries) > 1):
+            key, _ = entries.popitem(False)
+            self.weight -= self.weights.pop(key)
+            self.evictions += 1
+
+    def stats(self):
+        if self.weigh:
+            for key, value in self.entries.iteritems():
+                self.weights[key] = self.weigh(key, value)
 
-    def append(self, value):
-        self.list.append(ref(value, self.on_delete))
+            self.weight = sum(self.weights.itervalues())
 
-    def on_delete(self, ref):
-        self.list.remove(ref)
+        return {'count': len(self.entries), 'weight': self.weight, 'hits': self.hits,
+            'misses': self.misses, 'evictions': self.evictions}
@@ -718,3 +718,117 @@ def test_assist_for_class_parents(project):
         class Boo(F|
     ''')
     assert 'Foo' in result
+
+def test_assist_must_narrow_previous_proposals_when_match_is_extended(project, monkeypatch):
+    result = do_assist(project, '''
+        var1 = 1
+        var2 = 2
+        va|
+        var3 = 3
+    ''')
+    assert result == ['var1', 'var2', 'vars']
+
+    import supplement.assistant
+    def fail(*args):
+        raise Exception('Must not be called')
+    monkeypatch.setattr(supplement.assistant, 'get_scope_at', fail)
+
+    result = do_assist(project, '''
+        var1 = 1
+        var2 = 2
+        var|
+        var3 = 3
+    ''')
+    assert result == ['var1', 'var2', 'vars']
+
+    result = do_assist(project, '''
+        var1 = 1
+        var2 = 2
+        var2|
+        var3 = 3
+    ''')
+    assert result == []
+
+    with pytest.raises(Exception):
+        do_assist(project, '''
+            var1 = 1
+            var2 = 3
+            var2|
+            var3 = 3
+        ''')
+
+def test_assist_must_reuse_inferred_names_until_dependency_change(project, monkeypatch):
+    project.create_module('toimport', '''
+        class Foo(object):
+            def foo(self):
+                pass
+    ''')
+
+    source = '''
+        from toimport import Foo
+        class Bar(Foo):
+            def bar(self):
+                %s
+                pass
+    '''
+
+    result = do_assist(project, source % 'self.|')
+    assert 'foo' in result and 'bar' in result
+
+    import supplement.assistant
+    def fail(*args):
+        raise Exception('Must not be called')
+    monkeypatch.setattr(supplement.assistant, 'infer', fail)
+
+    assert do_assist(project, source % 'self.fo|') == ['foo']
+
+    project.on_file_change('toimport.py')
+    with pytest.raises(Exception):
+        do_assist(project, source % 'self.|')
+
+def test_assist_must_not_infer_again_on_other_lines_of_scope(project, monkeypatch):
+    source = '''
+        class Foo(object):
+            def foo(self):
+                %s
+                %s
+    '''
+
+    import supplement.assistant
+    calls = []
+    def infer(*args):
+        calls.append(args[0])
+        return orig_infer(*args)
+    orig_infer = supplement.assistant.infer
+    monkeypatch.setattr(supplement.assistant, 'infer', infer)
+
+    assert 'foo' in do_assist(project, source % ('self.|', 'pass'))
+    assert 'foo' in do_assist(project, source % ('self.foo()', 'self.|'))
+    assert calls == ['self']
+
+    assert 'bar' in do_assist(project, source % ('self.bar = 1', 'self.|'))
+    assert calls == ['self', 'self']
+
+def test_assist_cache_must_respect_definitions_on_cursor_line(project):
+    assert 'append' in do_assist(project, 'x = []; x.|')
+    assert 'upper' in do_assist(project, 'x = ""; x.|')
+
+def test_assist_must_return_partial_result_when_inference_budget_is_exceeded(project):
+    source = '''
+        import os
+        os.pa|
+    '''
+
+    project.config['inference_steps'] = 0
+    assert do_assist(project, source) == []
+
+    project.config['inference_steps'] = 100
+    assert 'path' in do_assist(project, source)
+
+def test_call_collection_must_not_starve_assist_budget(project):
+    source = 'import os\n' + 'os.path.join("a", "b")\n' * 200 + 'os.pa|'
+
+    project.config['inference_steps'] = 100
+    project.config['collect_steps'] = 100
+    assert 'path' in do_assist(project, source)
+    assert project.calldb.files
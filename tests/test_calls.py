@@ -4,7 +4,9 @@ import pytest
 
 from supplement.assistant import infer
 from supplement.scope import Scope, traverse_tree
-from supplement.calls import CallExtractor
+from supplement.calls import CallExtractor, prepare_source
+from supplement.project import Project
+from supplement.common import UnknownObject
 
 from .helpers import pytest_funcarg__project, do_assist
 
@@ -55,7 +57,7 @@ def test_calls_update(project):
     ''')
 
     project.calldb.collect_calls(scope)
-    assert len(project.calldb.calls[(None, 'foo')]) == 0
+    assert (None, 'foo') not in project.calldb.calls
 
 def test_calldb_must_provide_arguments_for_function(project):
     result = do_assist(project, '''
@@ -117,3 +119,157 @@ def test_calldb_for_imported_class(project):
     ''')
 
     assert 'append' in result
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_index_project_must_collect_calls_from_all_sources(project, tmpdir, processes):
+    project.set_root(str(tmpdir))
+    lib = tmpdir.join('indexlib%d.py' % processes)
+    lib.write('def foo(arg):\n    return arg\n')
+    tmpdir.join('indexuser%d.py' % processes).write(
+        'from indexlib%d import foo\nfoo([])\n' % processes)
+    tmpdir.join('broken%d.py' % processes).write('foo(\n')
+
+    project.calldb.index_project(processes=processes)
+    assert project.calldb.progress == (3, 3)
+
+    result = do_assist(project, '''
+        def foo(arg):
+            arg.a|
+    ''', str(lib))
+    assert 'append' in result
+
+def test_index_workers_must_return_call_positions(tmpdir):
+    fname = tmpdir.join('positions.py')
+    fname.write('def foo(arg):\n    bar()\n    baz(arg)\n\nfoo(1)\n')
+
+    filename, source, stamp, positions = prepare_source(str(fname))
+    assert positions == [('', 0), ('foo', 1)]
+
+    fname.write('foo()\n')
+    assert prepare_source(str(fname))[1:2] == (None,)
+
+def test_indexed_calls_must_not_hold_caller_scopes(tmpdir):
+    lib = tmpdir.join('heldlib.py')
+    lib.write('def foo(arg):\n    return arg\n')
+    user = tmpdir.join('helduser.py')
+    user.write('from heldlib import foo\nfoo([])\n')
+
+    project = Project(str(tmpdir))
+    project.calldb.index_project(processes=0)
+
+    ci, = project.calldb.calls[(str(lib), 'foo')]
+    assert not (ci.scope and ci.scope())
+    assert str(user) not in project.scope_cache.scopes
+
+    assert 'append' in ci.get_arg(0)
+    assert str(user) in project.scope_cache.scopes
+
+def test_stored_calls_must_survive_project_restart(project, tmpdir):
+    config = {'cache_dir': str(tmpdir.join('cache'))}
+    src = tmpdir.join('src')
+    lib = src.join('storedlib.py')
+    lib.write('def foo(arg):\n    return arg\n', ensure=True)
+    user = src.join('storeduser.py')
+    user.write('from storedlib import foo\nfoo([])\n')
+
+    Project(str(src), config).calldb.index_project(processes=0)
+
+    source = '''
+        def foo(arg):
+            arg.|
+    '''
+
+    project = Project(str(src), config)
+    assert 'append' in do_assist(project, source, str(lib))
+    assert str(user) in project.calldb.files
+    assert project.calldb.progress is None
+
+    project.calldb.index_project(processes=0)
+    assert project.calldb.progress == (2, 2)
+
+    user.write('from storedlib import foo\nfoo("")\n')
+    user.setmtime(user.mtime() + 10)
+
+    project = Project(str(src), config)
+    result = do_assist(project, source, str(lib))
+    assert 'append' not in result and 'lower' in result
+
+def test_restore_must_collect_calls_of_file_missing_in_store(tmpdir):
+    src = tmpdir.join('src')
+    lib = src.join('missinglib.py')
+    lib.write('def foo(arg):\n    return arg\n', ensure=True)
+    user = src.join('missinguser.py')
+    user.write('from missinglib import foo\nfoo([])\n')
+
+    project = Project(str(src), {'cache_dir': str(tmpdir.join('cache'))})
+    project.calldb.restore_file(str(user))
+    assert (str(lib), 'foo') in project.calldb.calls
+    assert project.calldb.store.get_stamp(str(user))
+
+def test_stored_callers_must_be_restored_lazily(tmpdir):
+    config = {'cache_dir': str(tmpdir.join('cache'))}
+    src = tmpdir.join('src')
+    lib = src.join('lazylib.py')
+    lib.write('def foo(arg):\n    return arg\n', ensure=True)
+    for i in range(5):
+        src.join('lazyuser%d.py' % i).write('from lazylib import foo\nfoo([])\n')
+
+    Project(str(src), config).calldb.index_project(processes=0)
+
+    config['max_evaluated_calls'] = 2
+    project = Project(str(src), config)
+    assert 'append' in do_assist(project, '''
+        def foo(arg):
+            arg.|
+    ''', str(lib))
+    assert len([r for r in project.calldb.files if 'lazyuser' in r]) == 2
+
+def test_calldb_must_replace_file_calls_and_limit_calls_per_callee():
+    calldb = Project('.', {'max_calls_per_callee': 3}).calldb
+
+    calldb.update_calls('a.py', [('lib.py', 'foo', 1), ('lib.py', 'foo', 2), ('lib.py', 'bar', 3)])
+    calldb.update_calls('b.py', [('lib.py', 'foo', 4)])
+    assert list(calldb.calls[('lib.py', 'foo')]) == [4, 1, 2]
+    assert calldb.files['a.py'] == set([('lib.py', 'foo'), ('lib.py', 'bar')])
+
+    calldb.update_calls('a.py', [('lib.py', 'foo', 5)])
+    assert list(calldb.calls[('lib.py', 'foo')]) == [5, 4]
+    assert ('lib.py', 'bar') not in calldb.calls
+    assert calldb.files['a.py'] == set([('lib.py', 'foo')])
+
+    calldb.update_calls('c.py', [('lib.py', 'foo', 6), ('lib.py', 'foo', 7)])
+    assert list(calldb.calls[('lib.py', 'foo')]) == [6, 7, 5]
+    assert calldb.files['b.py'] == set()
+
+def test_calldb_must_evaluate_limited_number_of_ranked_calls():
+    evaluated = []
+    class Call(object):
+        def __init__(self, value, name):
+            self.args = [value]
+            self.nargs = 1
+            self.name = name
+
+        def get_arg(self, idx):
+            evaluated.append(self.name)
+            return self.args[idx]
+
+    class FunctionScope(object):
+        filename = 'lib.py'
+        fullname = 'foo'
+        args = ['arg']
+
+    calldb = Project('.', {'max_evaluated_calls': 2}).calldb
+    calldb.update_calls('old.py', [('lib.py', 'foo', Call('x', 'old'))])
+    calldb.update_calls('lib.py', [('lib.py', 'foo', Call(None, 'lib'))])
+    calldb.update_calls('new.py', [('lib.py', 'foo', Call(None, 'new'))])
+
+    args = calldb.get_args_for_scope(FunctionScope)
+    assert evaluated == ['lib', 'new']
+    assert isinstance(args[0], UnknownObject)
+
+    assert calldb.get_args_for_scope(FunctionScope) is args
+    assert evaluated == ['lib', 'new']
+
+    calldb.update_calls('new.py', [('lib.py', 'foo', Call('y', 'new2'))])
+    assert calldb.get_args_for_scope(FunctionScope) == ['y']
+    assert evaluated == ['lib', 'new', 'lib', 'new2']
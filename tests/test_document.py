@@ -0,0 +1,54 @@
+import pytest
+
+from supplement.document import Document, DocumentStore, DocumentError, DocumentOutdated
+
+def test_change_must_apply_edits_sequentially():
+    doc = Document('test.py', 'import os\nos.pa')
+    new = doc.change([(15, 15, 'th'), (0, 6, 'from')], 2)
+
+    assert new.source == 'from os\nos.path'
+    assert new.version == 2
+    assert doc.source == 'import os\nos.pa'
+
+def test_change_must_reject_invalid_ranges():
+    doc = Document('test.py', 'abc')
+    with pytest.raises(DocumentError):
+        doc.change([(2, 10, '')], 1)
+
+def test_ast_must_be_cached_per_version():
+    doc = Document('test.py', 'import os\nos.')
+    tree, fixed = doc.get_ast()
+    assert doc.get_ast()[0] is tree
+
+    new = doc.change([(13, 13, 'path')], 1)
+    assert new.get_ast()[0] is not tree
+
+def test_store_must_check_version():
+    store = DocumentStore()
+    store.open('test.py', 'a', 1)
+    store.change('test.py', 2, [(1, 1, 'b')])
+
+    assert store.get('test.py').source == 'ab'
+    assert store.get('test.py', 2).source == 'ab'
+
+    with pytest.raises(DocumentOutdated):
+        store.get('test.py', 1)
+
+    with pytest.raises(DocumentError):
+        store.get('test.py', 3)
+
+    store.close('test.py')
+    with pytest.raises(DocumentError):
+        store.get('test.py')
+
+def test_changed_document_must_reuse_unchanged_statements():
+    doc = Document('test.py', 'def foo():\n    pass\n\ndef bar():\n    pass\n')
+    tree, _ = doc.get_ast()
+    bar = tree.body[1]
+
+    new = doc.change([(15, 19, 'return 1\n    ')], 1)
+    new_tree, fixed = new.get_ast()
+
+    assert new_tree.body[1] is bar
+    assert bar.lineno == 5
+    assert fixed == new.source
@@ -1,6 +1,7 @@
-from supplement.evaluator import infer
+from supplement.evaluator import infer, InferenceCache
 from supplement.scope import StaticScope, get_scope_at
 from supplement.common import UnknownObject
+from supplement.names import CALL_RESULTS_SIZE
 
 from .helpers import pytest_funcarg__project, cleantabs
 
@@ -309,4 +310,94 @@ def test_empty_return(project):
             return
     ''')
     obj = infer('foo()', scope, 100)
-    assert isinstance(obj, UnknownObject)
\ No newline at end of file
+    assert isinstance(obj, UnknownObject)
+
+def test_function_call_results_must_be_cached_by_argument_types(project):
+    scope = project.create_scope('''
+        class Foo(object):
+            pass
+
+        def foo(arg):
+            return arg
+
+        def bar():
+            return []
+    ''')
+
+    assert infer('bar()', scope, 8) is infer('bar()', scope, 8)
+    assert infer('foo(Foo())', scope, 8) is infer('foo(Foo())', scope, 8)
+    assert 'append' in infer('foo([])', scope, 8)
+    assert infer('foo(1)', scope, 8) is infer('foo(2)', scope, 8)
+
+    func = infer('foo', scope, 8)
+    for r in range(CALL_RESULTS_SIZE * 2):
+        infer('foo([%d])' % r, scope, 8)
+    assert len(func._results) == CALL_RESULTS_SIZE
+
+    bar = scope.get_child_by_name('bar').function
+    result = bar.op_call()
+    returns = bar.get_returns()
+
+    scope.replace_node(scope.node)
+    assert bar.op_call() is not result
+    assert bar.get_returns() is returns
+
+def test_class_attribute_table_must_be_cached_until_any_base_changes(project):
+    m = project.create_module('toimport', '''
+        class Base(object):
+            def foo(self):
+                pass
+    ''')
+
+    scope = project.create_scope('''
+        from toimport import Base
+
+        class Foo(Base):
+            def __init__(self):
+                self.bar = 1
+    ''')
+
+    cls = scope.get_name('Foo')
+    table = cls.get_attribute_table()
+    assert table.owners['foo'] is m['Base']
+    assert table.owners['__init__'] is cls
+    assert cls.get_attribute_table() is table
+
+    obj = infer('Foo()', scope, 6)
+    names = obj.get_names()
+    assert 'foo' in names and 'bar' in names
+    assert obj.get_names() is names
+
+    m.generation += 1
+    assert cls.get_attribute_table() is not table
+    assert obj.get_names() is not names
+
+def test_class_with_volatile_base_must_rebuild_only_attribute_table(project):
+    scope = project.create_scope('''
+        class Base(object):
+            pass
+
+        def make_base():
+            return Base()
+
+        class Foo(make_base()):
+            pass
+    ''')
+
+    cls = scope.get_name('Foo')
+    bases = cls.get_bases()
+    table = cls.get_attribute_table()
+    assert table.volatile
+
+    assert cls.get_attribute_table() is not table
+    assert cls.get_bases() is bases
+
+def test_inference_cache_must_forget_dependents_of_dropped_entries():
+    cache = InferenceCache(1)
+    cache.get(('a.py', 'foo'), 1, lambda: 1)
+    cache.get(('b.py', 'foo'), 1, lambda: 2)
+    assert cache.dependents == {'b.py': set([('b.py', 'foo')])}
+
+    cache.get(('b.py', 'foo'), 2, lambda: 3)
+    cache.invalidate('b.py')
+    assert not cache.entries and not cache.dependents
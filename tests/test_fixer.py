@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
+import ast
 import pytest
-from supplement.fixer import fix, sanitize_encoding
+from supplement.fixer import fix, fix_incremental, sanitize_encoding, scan_fixes
 
 from .helpers import pytest_funcarg__project, do_assist, cleantabs
 
@@ -173,3 +174,120 @@ def test_dot_in_for(project):
             pass
     ''')
     assert 'append' in result
+
+
+def check_incremental_fix(code, new_code):
+    code = cleantabs(code)
+    new_code = cleantabs(new_code)
+
+    tree, fixed = fix(code)
+    reused = tree.body[:]
+    result, result_fixed = fix_incremental(tree, code, fixed, new_code)
+    expected, expected_fixed = fix(new_code)
+
+    assert ast.dump(result, include_attributes=True) == ast.dump(expected, include_attributes=True)
+    assert result_fixed.splitlines() == expected_fixed.splitlines()
+    return [n for n in result.body if any(n is r for r in reused)]
+
+def test_incremental_fix_must_reparse_only_changed_statements():
+    reused = check_incremental_fix('''
+        import os
+
+        def foo():
+            return 1
+
+        def bar():
+            pass
+    ''', '''
+        import os
+
+        def foo():
+            a = 1
+            return os.path
+
+        def bar():
+            pass
+    ''')
+
+    assert [type(n) for n in reused] == [ast.Import, ast.FunctionDef]
+    assert reused[1].name == 'bar' and reused[1].lineno == 7
+
+def test_incremental_fix_must_handle_appends_and_removals():
+    check_incremental_fix('''
+        def foo():
+            return 1
+        def bar():
+            pass
+    ''', '''
+        def foo():
+            return 1
+            if
+        def bar():
+            pass
+    ''')
+
+    check_incremental_fix('''
+        a = 1; b = 2
+        def foo():
+            return 1
+        c = 3
+    ''', '''
+        a = 1; b = 3
+        c = 3
+    ''')
+
+def test_incremental_fix_must_fallback_when_previous_fixes_leak_outside_of_changed_region():
+    check_incremental_fix('''
+        try:
+            a = 1
+        b = 2
+        c = 3
+    ''', '''
+        try:
+            a = 1
+        b = 2
+        c = 4
+    ''')
+
+def test_incremental_fix_must_respect_future_imports():
+    check_incremental_fix('''
+        from __future__ import print_function
+
+        def foo():
+            pass
+
+        print(1)
+    ''', '''
+        from __future__ import print_function
+
+        def foo():
+            pass
+
+        print(1, 2)
+    ''')
+
+    check_incremental_fix('''
+        print(1, 2)
+    ''', '''
+        from __future__ import print_function
+        print(1, 2)
+    ''')
+
+def test_scan_fixes_must_find_all_errors_in_one_pass():
+    code = cleantabs('''
+        def foo():
+            for r in var.
+                pass
+
+            if
+        from . import boo
+        var[...]
+    ''')
+
+    fixes = scan_fixes(code)
+    assert [r[3] for r in fixes] == [('line-offset', 2, 17), ('end-of-line', 2),
+        ('end-of-line', 5)]
+
+    tree, fixed = fix(code)
+    assert fixed.splitlines()[1:5] == ['    for r in var._someattr:', '        pass', '',
+        '    if _somevar: pass']
@@ -1,8 +1,9 @@
 import sys
+import pytest
 
 from supplement.project import Project
 
-from .helpers import pytest_funcarg__project
+from .helpers import pytest_funcarg__project, cleantabs
 
 def pytest_generate_tests(metafunc):
     if 'module_name' in metafunc.funcargnames:
@@ -42,4 +43,148 @@ def test_module_loader_must_do_relative_load_without_sys_path(project, tmpdir):
     project.set_root(str(pkgdir))
 
     m = project.get_module('.toimport', str(pkgdir) + '/test.py')
-    assert 'test' in m
\ No newline at end of file
+    assert 'test' in m
+
+def test_import_worker_must_provide_module_content(tmpdir):
+    tmpdir.join('sandboxed.py').write(cleantabs('''
+        from collections import OrderedDict
+
+        class Base(object):
+            def method(self, a, b=None):
+                """Method doc"""
+
+        class Child(Base, OrderedDict):
+            pass
+
+        value = Child()
+    '''))
+
+    p = Project(str(tmpdir), {'import_worker': True})
+    m = p.get_module('sandboxed')
+
+    assert 'sandboxed' not in sys.modules
+    assert m.filename == str(tmpdir.join('sandboxed.py'))
+
+    method = m['Child']['method']
+    assert method.get_signature() == ('method', ['self', 'a', 'b'], None, None, (None,))
+    assert method.get_docstring() == 'Method doc'
+    assert method.get_location() == (4, m.filename)
+    assert 'method' in m['value'] and 'keys' in m['value']
+
+def test_import_worker_must_interrupt_hanging_import(tmpdir):
+    tmpdir.join('hanging.py').write('import time\ntime.sleep(30)\n')
+
+    p = Project(str(tmpdir), {'import_worker': True, 'import_timeout': 1})
+    with pytest.raises(ImportError):
+        p.get_module('hanging').module
+
+def test_static_modules_must_be_resolved_without_import(tmpdir):
+    pkgdir = tmpdir.join('static')
+    pkgdir.mkdir()
+    pkgdir.join('__init__.py').write('')
+    pkgdir.join('mod.py').write(cleantabs('''
+        raise Exception('Must not be imported')
+
+        from os import path
+
+        class Foo(object):
+            def foo(self):
+                pass
+
+        def func():
+            return Foo()
+
+        value = Foo()
+    '''))
+
+    p = Project(str(tmpdir), {'static_modules': True})
+    m = p.get_module('static.mod')
+
+    assert m.filename == str(pkgdir.join('mod.py'))
+    assert set(('path', 'Foo', 'value')) <= m.get_names()
+    assert 'foo' in m['value']
+    assert 'join' in m['path']
+    assert 'foo' in m['Foo']
+    assert m['Foo']['foo'].get_location()[0] == 6
+    assert 'foo' in m['func'].op_call([])
+    assert 'mod' in p.get_possible_imports('static')
+    assert not hasattr(m, '_module')
+
+def test_module_provider_must_remember_failed_imports(project, tmpdir, monkeypatch):
+    import supplement.module
+    calls = []
+    def load_module(project, name, package_path):
+        calls.append(name)
+        return orig_load_module(project, name, package_path)
+
+    orig_load_module = supplement.module.load_module
+    monkeypatch.setattr(supplement.module, 'load_module', load_module)
+
+    project.set_root(str(tmpdir))
+    for _ in range(2):
+        with pytest.raises(ImportError):
+            project.get_module('notexisting')
+
+    assert calls == ['notexisting']
+
+    tmpdir.join('notexisting.py').write('test = 1')
+    project.monitor.file_changed(str(tmpdir))
+
+    assert 'test' in project.get_module('notexisting')
+
+def test_module_provider_must_forget_failed_imports_of_missing_packages(project, tmpdir):
+    project.set_root(str(tmpdir))
+    with pytest.raises(ImportError):
+        project.get_module('pkg.mod')
+
+    assert str(tmpdir) in project.monitor.handlers
+
+    tmpdir.join('pkg').mkdir()
+    tmpdir.join('pkg', '__init__.py').write('')
+    tmpdir.join('pkg', 'mod.py').write('test = 1')
+    project.monitor.file_changed(str(tmpdir))
+
+    assert 'test' in project.get_module('pkg.mod')
+
+def test_module_trees_must_be_validated_by_file_stat(project, tmpdir):
+    import os
+    fname = tmpdir.join('changing.py')
+    fname.write('foo = 1\n')
+    project.set_root(str(tmpdir))
+
+    m = project.get_module('changing')
+    tree = project.get_ast(m)
+    assert 'foo' in m.get_scope()
+
+    os.utime(str(fname), (1, 1))
+    assert project.get_ast(m) is tree
+
+    fname.write('bar = 1\n')
+    os.utime(str(fname), (2, 2))
+    assert project.get_ast(m) is not tree
+    assert 'bar' in m.get_scope()
+    assert m.node_provider['bar'][0] == 'assign'
+
+def test_module_provider_must_not_remember_failures_of_existing_modules(project, tmpdir):
+    tmpdir.join('broken.py').write('raise ImportError("transient")')
+    project.set_root(str(tmpdir))
+
+    with pytest.raises(ImportError):
+        project.get_module('broken')
+
+    tmpdir.join('broken.py').write('test = 1')
+    assert 'test' in project.get_module('broken')
+
+def test_ast_cache_limit_must_cover_module_scopes(tmpdir):
+    tmpdir.join('first.py').write('foo = 1\n')
+    tmpdir.join('second.py').write('bar = 1\n')
+
+    p = Project(str(tmpdir), {'ast_cache_weight': 1, 'static_modules': True})
+    first = p.get_module('first')
+    assert 'foo' in first.get_scope()
+    assert 'bar' in p.get_module('second').get_scope()
+    assert len(p.ast_provider.cache) == 1
+
+    generation = first.generation
+    assert 'foo' in first.get_scope()
+    assert first.generation == generation
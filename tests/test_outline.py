@@ -0,0 +1,41 @@
+from supplement.project import Project
+from supplement.tree import AstProvider
+
+from .helpers import cleantabs
+
+def test_outline_must_be_persistent(tmpdir, monkeypatch):
+    tmpdir.join('outlined.py').write(cleantabs('''
+        import os
+        from os import path
+
+        def foo(a, b=None, *args):
+            pass
+
+        class Foo(object):
+            def bar(self):
+                pass
+
+            attr = 1
+
+        value = Foo()
+    '''))
+
+    cache_dir = str(tmpdir.join('cache'))
+    p = Project(str(tmpdir), {'cache_dir': cache_dir})
+    outline = p.get_outline(p.get_module('outlined'))
+    assert outline.imports == ['os']
+    assert outline.get_outline_node('foo')[1].args == (['a', 'b'], 'args', None, 1)
+    assert not p.ast_provider.cache
+
+    def get(self, module):
+        raise Exception('Module must not be parsed')
+
+    monkeypatch.setattr(AstProvider, 'get', get)
+
+    p = Project(str(tmpdir), {'cache_dir': cache_dir})
+    m = p.get_module('outlined')
+
+    assert m['foo'].get_location() == (4, m.filename)
+    assert m['Foo']['bar'].get_location() == (8, m.filename)
+    assert m['Foo']['attr'].get_location() == (11, m.filename)
+    assert m['value'].get_location() == (13, m.filename)
@@ -53,3 +53,22 @@ def test_eval():
 
     result = env.eval(source)
     assert any('site-packages' in r for r in result)
+
+@pytest.mark.slow
+def test_submit_must_pipeline_requests():
+    env = get_env()
+
+    source = cleantabs('''
+        from os import popen
+        p''')
+
+    assist = env.submit('assist', '.', source, len(source), 'test.py')
+    syntax = env.submit('check_syntax', 'a = (')
+    lint = env.submit('lint', '.', source, 'test.py', False)
+
+    assert assist.result()[1] == ['popen', 'pow', 'print', 'property']
+    assert syntax.result() is not None
+    assert lint.result() is not None
+    assert assist.done() and syntax.done() and lint.done()
+
+    env.close()
@@ -1,4 +1,5 @@
-from supplement.scope import get_scope_at
+from supplement.scope import get_scope_at, ScopeCache
+from supplement.document import Document
 
 from .helpers import cleantabs, pytest_funcarg__project
 
@@ -151,3 +152,98 @@ def test_scope_with_decorators(project):
         6: 'Cls.m2',
         7: 'Cls.m2',
     }, True)
+
+
+def test_scope_must_be_reused_for_the_same_source(project):
+    source = cleantabs("""
+        def foo():
+            pass
+    """)
+
+    scope = get_scope_at(project, source, 2, 'test.py')
+    assert get_scope_at(project, source, 2, 'test.py') is scope
+
+def test_scope_cache_must_drop_least_recently_used_files(project):
+    project.scope_cache = ScopeCache(2)
+    source = cleantabs("""
+        def foo():
+            pass
+    """)
+
+    first = get_scope_at(project, source, 2, 'first.py')
+    second = get_scope_at(project, source, 2, 'second.py')
+    assert get_scope_at(project, source, 2, 'first.py') is first
+
+    get_scope_at(project, source, 2, 'third.py')
+    assert len(project.scope_cache.scopes) == 2
+    assert get_scope_at(project, source, 2, 'first.py') is first
+    assert get_scope_at(project, source, 2, 'second.py') is not second
+
+def test_unchanged_child_scopes_must_be_reused_after_document_change(project):
+    doc = Document('test.py', cleantabs("""
+        def foo():
+            pass
+
+        def bar():
+            pass
+    """))
+
+    tree, source = doc.get_ast()
+    foo = get_scope_at(project, source, 2, 'test.py', tree)
+    bar = get_scope_at(project, source, 5, 'test.py', tree)
+    assert bar.fullname == 'bar'
+
+    doc = doc.change([(15, 19, 'a = 1\n    return a')], 1)
+    tree, source = doc.get_ast()
+
+    assert get_scope_at(project, source, 6, 'test.py', tree) is bar
+    new_foo = get_scope_at(project, source, 3, 'test.py', tree)
+    assert new_foo is not foo
+    assert new_foo.parent is bar.parent
+    assert 'a' in new_foo.get_names()
+
+def test_reused_scopes_must_respect_shifted_lines(project):
+    doc = Document('test.py', cleantabs("""
+        def foo():
+            pass
+
+        def bar():
+            a = 1
+            b = 2
+    """))
+
+    tree, source = doc.get_ast()
+    bar = get_scope_at(project, source, 6, 'test.py', tree)
+    assert sorted(bar.get_names(5)) == ['a']
+
+    doc = doc.change([(15, 19, 'a = 1\n    b = 2\n    c = 3\n    return a')], 1)
+    tree, source = doc.get_ast()
+
+    bar2 = get_scope_at(project, source, 9, 'test.py', tree)
+    assert bar2 is bar
+    assert sorted(bar2.get_names(8)) == ['a']
+    assert sorted(bar2.get_names(9)) == ['a', 'b']
+    assert bar2.get_name('b', 9).get_location()[0] == 9
+
+def test_scope_lookup_must_create_only_scopes_on_the_path(project):
+    source = cleantabs("""
+        def foo():
+            pass
+
+        class Bar(object):
+            def bar(self):
+                pass
+
+            def baz(self):
+                pass
+    """)
+
+    scope = get_scope_at(project, source, 6, 'test.py')
+    assert scope.fullname == 'Bar.bar'
+
+    module = scope.get_toplevel()
+    assert not hasattr(module, 'children')
+    assert not hasattr(scope.parent, 'children')
+
+    assert module.get_child_by_name('Bar') is scope.parent
+    assert scope.parent.get_child_by_name('bar') is scope
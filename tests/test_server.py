@@ -0,0 +1,211 @@
+import time
+from threading import Thread, Event, Lock
+from multiprocessing import Pipe
+from cPickle import dumps, loads
+
+from supplement.server import Server
+
+def start_server(server_cls=Server):
+    conn, server_conn = Pipe()
+    server = server_cls(server_conn)
+    t = Thread(target=server.run)
+    t.daemon = True
+    t.start()
+    return conn, server
+
+def call(conn, *msg):
+    conn.send_bytes(dumps(msg, 2))
+
+def recv(conn, timeout=5):
+    assert conn.poll(timeout)
+    return loads(conn.recv_bytes())
+
+def test_legacy_messages_must_be_processed_synchronously():
+    conn, _ = start_server()
+    call(conn, 'check_syntax', ('a = 1',), {})
+    assert recv(conn) == (None, True)
+    call(conn, 'close', (), {})
+
+def test_cheap_calls_must_not_wait_for_slow_project_calls():
+    started = Event()
+    release = Event()
+
+    class SlowServer(Server):
+        def assist(self, path, source, position, filename):
+            started.set()
+            release.wait(5)
+            return 'slow'
+
+    conn, _ = start_server(SlowServer)
+    call(conn, 1, 'assist', ('.', '', 0, 'test.py'), {})
+    assert started.wait(5)
+
+    call(conn, 2, 'check_syntax', ('a = 1',), {})
+    assert recv(conn) == (2, None, True)
+
+    release.set()
+    assert recv(conn) == (1, 'slow', True)
+    call(conn, 'close', (), {})
+
+def test_calls_for_the_same_project_must_be_serialized():
+    log = []
+
+    class LogServer(Server):
+        def assist(self, path, source, position, filename):
+            log.append(('start', source))
+            time.sleep(0.05)
+            log.append(('end', source))
+            return source
+
+    conn, _ = start_server(LogServer)
+    call(conn, 1, 'assist', ('.', 'a', 0, 'a.py'), {})
+    call(conn, 2, 'assist', ('.', 'b', 0, 'b.py'), {})
+
+    assert set([recv(conn), recv(conn)]) == set([(1, 'a', True), (2, 'b', True)])
+    assert log[0][0] == 'start' and log[1] == ('end', log[0][1])
+    call(conn, 'close', (), {})
+
+def test_cache_stats_must_wait_for_project_calls():
+    started = Event()
+    release = Event()
+
+    class SlowServer(Server):
+        def assist(self, path, source, position, filename):
+            started.set()
+            release.wait(5)
+            return 'slow'
+
+    conn, _ = start_server(SlowServer)
+    call(conn, 1, 'assist', ('.', '', 0, 'test.py'), {})
+    assert started.wait(5)
+
+    call(conn, 2, 'get_cache_stats', ('.',), {})
+    assert not conn.poll(0.1)
+
+    release.set()
+    replies = dict((r[0], r[1:]) for r in (recv(conn), recv(conn)))
+    assert replies[1] == ('slow', True)
+    assert replies[2][1] is True and 'modules' in replies[2][0]
+    call(conn, 'close', (), {})
+
+def test_newer_request_for_the_same_file_must_supersede_older_ones():
+    started = Event()
+    release = Event()
+    processed = []
+
+    class SlowServer(Server):
+        def assist(self, path, source, position, filename):
+            started.set()
+            release.wait(5)
+            processed.append(source)
+            return source
+
+    conn, _ = start_server(SlowServer)
+    call(conn, 1, 'assist', ('.', 'a', 0, 'test.py'), {})
+    assert started.wait(5)
+
+    call(conn, 2, 'assist', ('.', 'b', 0, 'test.py'), {})
+    call(conn, 3, 'get_docstring', ('.', 'c', 0, 'other.py'), {})
+    call(conn, 4, 'assist', ('.', 'd', 0, 'test.py'), {})
+    time.sleep(0.1)
+    release.set()
+
+    replies = dict((r[0], r[1:]) for r in (recv(conn) for _ in range(4)))
+    assert replies[1] == (('Cancelled', 'Superseded by newer request'), False)
+    assert replies[2] == (('Cancelled', 'Superseded by newer request'), False)
+    assert replies[3][1] is True
+    assert replies[4] == ('d', True)
+    assert 'b' not in processed
+    call(conn, 'close', (), {})
+
+def test_requests_of_other_kind_must_not_supersede_each_other():
+    release = Event()
+
+    class SlowServer(Server):
+        def assist(self, path, source, position, filename):
+            release.wait(5)
+            return source
+
+        def get_docstring(self, path, source, position, filename):
+            return 'doc'
+
+    conn, _ = start_server(SlowServer)
+    call(conn, 1, 'assist', ('.', 'a', 0, 'test.py'), {})
+    call(conn, 2, 'get_docstring', ('.', 'a', 0, 'test.py'), {})
+    time.sleep(0.1)
+    release.set()
+
+    assert set([recv(conn), recv(conn)]) == set([(1, 'a', True), (2, 'doc', True)])
+    call(conn, 'close', (), {})
+
+def test_older_request_must_not_run_after_newer_one():
+    server = Server.__new__(Server)
+    server.locks_lock = Lock()
+    server.latest_requests = {}
+
+    args = ('.', 'a', 0, 'test.py')
+    server.register_request(1, 'assist', args, {})
+    server.register_request(2, 'assist', args, {})
+    key = server.get_supersede_key('assist', args, {})
+
+    assert not server.is_superseded(2, key)
+    assert server.is_superseded(1, key)
+
+def test_index_project_must_resolve_project_under_project_lock():
+    server = Server.__new__(Server)
+    server.locks_lock = Lock()
+    server.project_locks = {}
+    server.indexers = {}
+
+    locked = []
+    indexed = Event()
+
+    class CallDB(object):
+        def index_project(self, lock):
+            indexed.set()
+
+    class Project(object):
+        calldb = CallDB()
+
+    def get_project(path):
+        locked.append(server.get_project_lock(path).locked())
+        return Project()
+
+    server.get_project = get_project
+    server.index_project('.')
+
+    assert indexed.wait(5)
+    assert locked == [True]
+
+def test_queries_must_use_opened_document():
+    conn, _ = start_server()
+    call(conn, 1, 'open_document', ('test.py', 'from os import popen\npo', 1), {})
+    assert recv(conn) == (1, None, True)
+
+    call(conn, 2, 'change_document', ('test.py', 2, [(23, 23, 'p')]), {})
+    assert recv(conn) == (2, None, True)
+
+    call(conn, 3, 'assist', ('.', None, 24, 'test.py'), {'version': 2})
+    assert recv(conn) == (3, ('pop', ['popen']), True)
+
+    call(conn, 4, 'assist', ('.', None, 24, 'test.py'), {'version': 1})
+    assert recv(conn) == (4, ('Cancelled', 'Superseded by newer request'), False)
+
+    call(conn, 5, 'assist', ('.', None, 24, 'test.py'), {'version': 3})
+    rid, result, is_ok = recv(conn)
+    assert not is_ok and result[0] == 'DocumentError'
+
+    call(conn, 'close', (), {})
+
+def test_reply_must_report_exceeded_inference_budget():
+    conn, _ = start_server()
+    call(conn, 1, 'configure_project', ('.', {'inference_steps': 0}), {})
+    assert recv(conn) == (1, None, True)
+
+    call(conn, 2, 'assist', ('.', 'import os\nos.', 13, 'test.py'), {})
+    assert recv(conn) == (2, ('', []), True, {'budget_exceeded': True})
+
+    call(conn, 3, 'check_syntax', ('a = 1',), {})
+    assert recv(conn) == (3, None, True)
+
+    call(conn, 'close', (), {})
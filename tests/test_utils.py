@@ -1,23 +1,40 @@
-from supplement.utils import WeakedList
+from supplement.utils import NameIndex, LRUCache
 
-def test_weaked_list():
-    class A(object): pass
+def test_name_index():
+    idx = NameIndex({'foo': 5, 'bar': 1, 'foobar': 3, 'baz': 10})
 
-    wl = WeakedList()
+    assert sorted(idx.visible(3)) == ['bar', 'foobar']
+    assert idx.visible(0) == []
+    assert idx.select('foo') == ['foo', 'foobar']
+    assert idx.select('foo', 4) == ['foobar']
+    assert idx.select(u'ba') == ['bar', 'baz']
+    assert idx.select('') == ['bar', 'baz', 'foo', 'foobar']
+    assert idx.select('x') == []
 
-    holder1 = [A(), A()]
-    holder2 = [A()]
-    holder3 = {'key':A()}
 
-    wl.append(holder1[0])
-    wl.append(holder1[1])
-    wl.append(holder2[0])
-    wl.append(holder3['key'])
+def test_lru_cache_must_evict_least_recently_used_entries():
+    cache = LRUCache(3, 10, lambda key, value: value)
+    cache['a'] = 1
+    cache['b'] = 2
+    cache['c'] = 3
+    cache['a']
+    cache['d'] = 1
 
-    assert [holder1[0], holder1[1], holder2[0], holder3['key']] == list(wl)
+    assert list(cache) == ['c', 'a', 'd']
 
-    holder1[:] = []
-    assert [holder2[0], holder3['key']] == list(wl)
+    cache['e'] = 9
+    assert list(cache) == ['d', 'e']
+    assert cache.get('a') is None
 
-    del holder3['key']
-    assert [holder2[0]] == list(wl)
+    assert cache.stats() == {'count': 2, 'weight': 10, 'hits': 1,
+        'misses': 1, 'evictions': 3}
+
+def test_lru_cache_must_reweigh_entries_on_hit():
+    cache = LRUCache(weight=2, weigh=lambda key, value: len(value), reweigh=True)
+    cache['a'] = []
+    cache['b'] = []
+    cache['a'].extend([1, 2, 3])
+    assert list(cache) == ['b', 'a']
+
+    cache['a']
+    assert list(cache) == ['a']